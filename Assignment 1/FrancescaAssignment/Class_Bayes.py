@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Bayes:
 
     def __init__(self, list_hypo, list_priors, list_obs, list_likelihood):
@@ -37,4 +40,19 @@ class Bayes:
         posterior_probs = []
         for obs in list_obs:
             posterior_probs.append(self.single_posterior_update(obs, self.list_priors))
-        return posterior_probs
\ No newline at end of file
+        return posterior_probs
+
+    def compute_posterior_counts(self, list_obs):
+        """Gets a list of i.i.d. observations and returns the posterior after all of them.
+        Only the number of times each observation occurs matters, so the list is counted once
+        and the posterior is computed in log space: log prior + counts @ log likelihood.T
+        """
+        likelihood = np.asarray(self.list_likelihood, dtype=float)
+        obs_index = {obs: i for i, obs in enumerate(self.list_obs)}
+        counts = np.bincount([obs_index[obs] for obs in list_obs], minlength=len(self.list_obs))
+        used = counts > 0
+        with np.errstate(divide='ignore'):
+            log_post = np.log(np.asarray(self.list_priors, dtype=float))
+            log_post = log_post + np.log(likelihood[:, used]) @ counts[used]
+        post = np.exp(log_post - np.max(log_post))
+        return (post / post.sum()).tolist()
@@ -1,6 +1,12 @@
+import numpy as np
+
+from bayes_engine import BayesEngine, PosteriorState, credible_indices, logsumexp, normalize_log, to_log, top_indices
+from bayes_parallel import ShardedEngine
+
+
 class Bayes:
     'Class for mathematical operations using Bayes rule'
-    def __init__(self, hypos, priors, obs, probabilities):
+    def __init__(self, hypos, priors, obs, probabilities, chunk_size=None, transition=None):
         """
         The constructor for Bayes class.
 
@@ -9,11 +15,88 @@ class Bayes:
             priors (list): list of priors of the hypotheses
             obs (list): list of possible observations
             likelihood (array): A double array returning the probability. The first index is for the hypothesis, the second index for the observation
+            chunk_size (int): process the likelihood table in blocks of at most chunk_size hypotheses,
+                which lets it be an np.memmap that is never loaded as a whole (see from_npy)
+            transition (array): optional H x H matrix, transition[i][j] = P(next hypothesis j | hypothesis i),
+                for hypotheses that drift over time (see forward_filter). None means the hypothesis is fixed.
         """
         self.hypos = hypos
         self.priors = priors
         self.obs = obs
         self.probabilities = probabilities
+        self.engine = BayesEngine(hypos, obs, probabilities, chunk_size)
+        self.transition = None if transition is None else np.asarray(transition, dtype=float)
+        self.channels = {}
+
+    @classmethod
+    def from_channels(cls, hypos, priors, channels, chunk_size=None):
+        """
+        Creates a model whose observations carry several independent channels (naive Bayes), e.g. ring
+        color, distance and wind, each with its own likelihood table. Memory stays linear in the number
+        of channels instead of growing with the product of their vocabularies.
+
+        Parameters:
+            hypos (list): list of hypotheses
+            priors (list): list of priors of the hypotheses
+            channels (dict): channel name -> (list of possible observations, likelihood table of that channel)
+            chunk_size (int): see __init__
+
+        Returns:
+            Bayes: model whose single-channel methods use the first channel, and whose *_channels
+                methods use all of them
+        """
+        channels = list(channels.items())
+        _, (obs, probabilities) = channels[0]
+        model = cls(hypos, priors, obs, probabilities, chunk_size)
+        model.channels = {name: BayesEngine(hypos, channel_obs, table, chunk_size)
+                          for name, (channel_obs, table) in channels}
+        return model
+
+    @classmethod
+    def from_npy(cls, path, obs, priors=None, hypos=None, chunk_size=65536):
+        """
+        Loads a model whose likelihood table is stored in a .npy file. The file is memory-mapped
+        instead of read, so loading is instant and posterior updates run in hypothesis chunks,
+        keeping peak memory around chunk_size * O plus the posterior vector.
+
+        Parameters:
+            path (String): .npy file holding the (H, O) likelihood table
+            obs (list): list of possible observations
+            priors (array): priors of the hypotheses, uniform when omitted
+            hypos (list): list of hypotheses, the row numbers 0..H-1 when omitted
+            chunk_size (int): maximum number of hypotheses processed at once
+
+        Returns:
+            Bayes: model backed by the memory-mapped table
+        """
+        probabilities = np.load(path, mmap_mode='r')
+        n_hypos = probabilities.shape[0]
+        if hypos is None:
+            hypos = range(n_hypos)
+        if priors is None:
+            priors = np.full(n_hypos, 1.0 / n_hypos)
+        return cls(hypos, priors, obs, probabilities, chunk_size)
+
+    def save_npy(self, path):
+        """
+        Stores the likelihood table as a .npy file that can be loaded again with from_npy.
+        """
+        np.save(path, np.asarray(self.probabilities, dtype=float))
+
+    @property
+    def priors(self):
+        """
+        Current probabilities of the hypotheses. Internally the state is kept as an unnormalized
+        log-posterior, which is only normalized (with log-sum-exp) when this property is read.
+        """
+        if self._priors is None:
+            self._priors = normalize_log(self.log_priors).tolist()
+        return self._priors
+
+    @priors.setter
+    def priors(self, priors):
+        self._priors = priors
+        self.log_priors = to_log(priors)
 
     def likelihood(self, observation, hypothesis):
         """
@@ -27,10 +110,8 @@ class Bayes:
             Float: likelihood P(O|H)
         """
         try:
-            indexObs = self.obs.index(observation)
-            indexHypos = self.hypos.index(hypothesis)
-            return self.probabilities[indexHypos][indexObs]
-        except ValueError:
+            return self.engine.lookup(observation, hypothesis).item()
+        except KeyError:
             print("Observation or Hypothesis value not found in list")
             return None
 
@@ -44,11 +125,8 @@ class Bayes:
         Returns:
             Float: Normalizing constant P(O)
         """
-        constant = 0
-        for hypothesis, prior in zip(self.hypos, self.priors):
-            probability = prior * self.likelihood(observation, hypothesis)
-            constant += probability
-        return constant
+        index = self.engine.obs_index[observation]
+        return self.engine.predictive(self.priors, index).item()
 
     def single_posterior_update(self, observation, priors):
         """
@@ -61,26 +139,487 @@ class Bayes:
         Returns:
             List: list of posterior probabilities
         """
-        posterior = []
-        for hypothesis, prior in zip(self.hypos, priors):
-            likelihood = self.likelihood(observation, hypothesis)
-            normalization = self.norm_constant(observation)
-            post = (prior * likelihood) / normalization
-            posterior.append(post)
-        return posterior
+        index = self.engine.obs_index[observation]
+        return self.engine.update(priors, index).tolist()
+
+    def log_posterior_update(self, observation, log_priors):
+        """
+        Calculates the log-probability of the hypothesis after one observation, without normalizing.
+
+        Parameters:
+            observation (String): one observation from the list of observations.
+            log_priors (array): log-probability (up to a constant) of the hypotheses before the observation
+
+        Returns:
+            ndarray: unnormalized log-posterior per hypothesis
+        """
+        return self.engine.log_update(log_priors, self.engine.obs_index[observation])
+
+    def normalize(self, log_posterior):
+        """
+        Turns an unnormalized log-posterior into a list of posterior probabilities.
+        """
+        return normalize_log(log_posterior).tolist()
 
-    def compute_posterior(self, observations):
+    def observe(self, observations, use_counts=False):
+        """
+        Folds a list of observations into self.priors in log space. Nothing is normalized here,
+        so any number of calls can be batched and the normalization is paid once, when self.priors is read.
+
+        Parameters:
+            observations (String): List of observations
+            use_counts (bool): see compute_posterior
+        """
+        indices = self.engine.obs_indices(observations)
+        if len(indices) == 0:
+            return
+        if use_counts:
+            log_likelihood = self.engine.count_log_likelihood(self.engine.counts(indices))
+        else:
+            log_likelihood = self.engine.log_likelihood(indices)
+        self.log_priors = self.log_priors + log_likelihood
+        self._priors = None
+
+    def compute_posterior(self, observations, use_counts=False, workers=None):
         """
         Calculates the posterior probabilites based on a list of observations.
 
         Parameters:
             observations (String): List of observations
+            use_counts (bool): the observations are i.i.d., so the posterior only depends on how often
+                each observation occurred. When True they are counted once and the posterior is computed
+                in a single log-space pass, O(N + H*O) instead of one update per observation.
+            workers (int or ShardedEngine): shard the hypotheses over this many processes (implies
+                use_counts). Pass a ShardedEngine from self.sharded() to reuse its pool over many calls.
 
         Returns:
             List: list of posterior probabilities per hypothesis
         """
-        posteriors = self.priors  # there are no observations made yet
+        if workers is not None:
+            counts = self.engine.counts(self.engine.obs_indices(observations))
+            if isinstance(workers, ShardedEngine):
+                self.log_priors = workers.log_posterior(self.log_priors, counts)
+            else:
+                with self.sharded(workers) as sharded:
+                    self.log_priors = sharded.log_posterior(self.log_priors, counts)
+            self._priors = None
+        else:
+            self.observe(observations, use_counts)  # self.priors becomes the computed posteriors
+        return self.priors
+
+    def sharded(self, workers=None, shards=None):
+        """
+        Creates a process pool that evaluates this model's posteriors over hypothesis shards, with the
+        likelihood table in shared memory. Use it as a context manager, or close() it when done.
+
+        Returns:
+            ShardedEngine: the pool, to be passed as the workers argument of compute_posterior
+        """
+        return ShardedEngine(self.engine, workers, shards)
+
+    def compute_posterior_batch(self, sequences, mask=None, priors=None):
+        """
+        Calculates the posterior of many independent observation sequences that share this model,
+        without changing self.priors.
+
+        Parameters:
+            sequences: either a list of observation lists (may be ragged), or a padded integer
+                matrix of shape (N, T) holding observation indices
+            mask (array): boolean (N, T) matrix marking the valid entries of a padded matrix;
+                all entries are used when omitted
+            priors (array): priors of shape (H,) shared by all sequences, or (N, H) with one row
+                per sequence. Defaults to self.priors.
+
+        Returns:
+            ndarray: (N, H) matrix with the posterior probabilities of every sequence
+        """
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+            n_sequences = sequences.shape[0]
+            if mask is None:
+                mask = np.ones(sequences.shape, dtype=bool)
+            rows, _ = np.nonzero(mask)
+            indices = sequences[mask]
+        else:
+            n_sequences = len(sequences)
+            lengths = [len(sequence) for sequence in sequences]
+            rows = np.repeat(np.arange(n_sequences), lengths)
+            indices = self.engine.obs_indices(observation for sequence in sequences for observation in sequence)
+        counts = self.engine.batch_counts(rows, indices, n_sequences)
+        log_priors = self.log_priors if priors is None else to_log(priors)
+        return normalize_log(log_priors + self.engine.count_log_likelihood(counts))
+
+    def new_state(self, priors=None):
+        """
+        Creates the running state for one observation stream. The model itself is never written to,
+        so one Bayes object can serve streams from many threads as long as each has its own state.
+
+        Parameters:
+            priors (list): priors of the stream, defaults to self.priors
+
+        Returns:
+            PosteriorState: state holding the log-posterior and the number of observations seen
+        """
+        log_priors = self.log_priors if priors is None else to_log(priors)
+        return PosteriorState(np.array(log_priors, dtype=float))
+
+    def update_state(self, state, observations):
+        """
+        Folds a list of observations into a stream state, without normalizing.
+        """
+        indices = self.engine.obs_indices(observations)
+        state.add(self.engine.log_likelihood(indices), len(indices))
+        return state
+
+    def stream_posterior(self, observations, every=1, priors=None, state=None):
+        """
+        Consumes any iterable or generator of observations and yields the posterior every k observations.
+        Only the last k observations are buffered, and neither self.priors nor any other model
+        attribute is changed, so it is safe to call from many threads on one shared model.
+
+        Parameters:
+            observations (iterable): stream of observations
+            every (int): number of observations between two yielded posteriors
+            priors (list): priors of the stream, defaults to self.priors
+            state (PosteriorState): state to continue from, e.g. one returned by new_state
+
+        Yields:
+            List: posterior probabilities after every k observations, and after the last one
+
+        Raises:
+            ValueError: if every is smaller than 1 (raised when the first posterior is requested)
+        """
+        if every < 1:
+            raise ValueError("every must be at least 1, got %r" % (every,))
+        if state is None:
+            state = self.new_state(priors)
+        obs_index = self.engine.obs_index
+        buffer = []
         for observation in observations:
-            posteriors = self.single_posterior_update(observation, posteriors)
-            self.priors = posteriors  # update self.priors to previous computed posteriors
-        return posteriors
+            buffer.append(obs_index[observation])
+            if len(buffer) == every:
+                state.add(self.engine.log_likelihood(buffer), every)
+                buffer = []
+                yield state.posterior().tolist()
+        if buffer:
+            state.add(self.engine.log_likelihood(buffer), len(buffer))
+            yield state.posterior().tolist()
+
+    def query_log_posterior(self, observations=None):
+        """
+        Returns the unnormalized log-posterior of self.priors updated with the observations, without changing self.priors.
+        """
+        if observations is None:
+            return self.log_priors
+        counts = self.engine.counts(self.engine.obs_indices(observations))
+        return self.log_priors + self.engine.count_log_likelihood(counts)
+
+    def top_k(self, k, observations=None):
+        """
+        Returns the k most probable hypotheses, found by partial selection on the log-posterior
+        instead of sorting all of them.
+
+        Parameters:
+            k (int): number of hypotheses
+            observations (list): observations to condition on first, self.priors is not changed
+
+        Returns:
+            List: (hypothesis, probability) pairs, most probable first
+        """
+        log_posterior = self.query_log_posterior(observations)
+        log_norm = logsumexp(log_posterior)
+        return [(self.hypos[i], np.exp(log_posterior[i] - log_norm).item()) for i in top_indices(log_posterior, k)]
+
+    def credible_set(self, mass, observations=None):
+        """
+        Returns the smallest set of hypotheses whose posterior probability together reaches mass.
+
+        Parameters:
+            mass (float): required credible mass, e.g. 0.95
+            observations (list): observations to condition on first, self.priors is not changed
+
+        Returns:
+            List: (hypothesis, probability) pairs, most probable first
+        """
+        log_posterior = self.query_log_posterior(observations)
+        log_norm = logsumexp(log_posterior)
+        return [(self.hypos[i], np.exp(log_posterior[i] - log_norm).item()) for i in credible_indices(log_posterior, mass)]
+
+    def posterior_entropy(self, priors=None, channel=None):
+        """
+        Calculates, in one matrix computation, the entropy the posterior would have after each possible observation.
+
+        Parameters:
+            priors (array): current posterior, shape (H,) or a batch of shape (N, H). Defaults to self.priors.
+            channel: channel of a multi-channel model (see from_channels), by default the first one
+
+        Returns:
+            tuple: (predictive, entropy), both of shape (O,) or (N, O). predictive holds P(O) and entropy
+                the posterior entropy in nats; impossible observations get entropy 0.
+        """
+        if priors is None:
+            priors = normalize_log(self.log_priors)
+        engine = self.engine if channel is None else self.channels[channel]
+        predictive, joint_entropy_sum = engine.entropy_terms(priors)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy = np.where(predictive > 0, np.log(predictive) - joint_entropy_sum / predictive, 0.0)
+        return predictive, entropy
+
+    def expected_information_gain(self, priors=None, channel=None):
+        """
+        Calculates the expected reduction in entropy from one more observation: H(prior) - sum_o P(o) H(posterior | o).
+
+        Parameters:
+            priors (array): current posterior, shape (H,) or a batch of shape (N, H). Defaults to self.priors.
+            channel: channel of a multi-channel model (see from_channels), by default the first one
+
+        Returns:
+            Float or ndarray: expected information gain in nats, one value per posterior
+        """
+        if priors is None:
+            priors = normalize_log(self.log_priors)
+        priors = np.asarray(priors, dtype=float)
+        predictive, entropy = self.posterior_entropy(priors, channel)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prior_entropy = -np.sum(np.where(priors > 0, priors * np.log(priors), 0.0), axis=-1)
+        return prior_entropy - np.sum(predictive * entropy, axis=-1)
+
+    def most_informative_observation(self, priors=None):
+        """
+        Returns the possible observation that would leave the posterior with the lowest entropy,
+        or a list with one observation per posterior for a batch of shape (N, H).
+        """
+        predictive, entropy = self.posterior_entropy(priors)
+        entropy = np.where(predictive > 0, entropy, np.inf)
+        best = np.argmin(entropy, axis=-1)
+        if np.ndim(best) == 0:
+            return self.obs[best]
+        return [self.obs[i] for i in best]
+
+    def most_informative_channel(self, priors=None):
+        """
+        Returns the channel of a multi-channel model whose observation has the highest expected
+        information gain, i.e. the test that is expected to shrink the posterior most.
+        """
+        names = list(self.channels)
+        gains = np.array([self.expected_information_gain(priors, name) for name in names])
+        return names[np.argmax(gains)]
+
+    def padded(self, sequences, mask=None):
+        """
+        Brings a batch of sequences into padded form.
+
+        Parameters:
+            sequences: a list of observation lists (may be ragged), or an already padded (N, T) index matrix
+            mask (array): boolean (N, T) matrix of valid entries of a padded matrix, all valid when omitted
+
+        Returns:
+            tuple: (matrix, mask), the (N, T) observation index matrix and its boolean mask
+        """
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+            if mask is None:
+                mask = np.ones(sequences.shape, dtype=bool)
+            return sequences, np.asarray(mask, dtype=bool)
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.intp)
+        mask = np.arange(lengths.max(initial=0)) < lengths[:, None]
+        matrix = np.zeros(mask.shape, dtype=np.intp)
+        matrix[mask] = self.engine.obs_indices(observation for sequence in sequences for observation in sequence)
+        return matrix, mask
+
+    def sequential_decision(self, streams, threshold, mask=None, priors=None):
+        """
+        Consumes many observation streams in parallel and stops each one as soon as any hypothesis
+        reaches the threshold, e.g. 0.99 that the archer is "Expert". Decided streams are retired,
+        so every step only updates the streams that are still undecided. self.priors is not changed.
+
+        Parameters:
+            streams: a list of observation lists (may be ragged), or a padded (N, T) index matrix
+            threshold (float): posterior probability at which a stream is decided
+            mask (array): boolean (N, T) matrix of valid entries of a padded matrix
+            priors (array): priors of shape (H,) shared by all streams, or (N, H). Defaults to self.priors.
+
+        Returns:
+            tuple: (decisions, stops, posteriors). decisions holds the decided hypothesis of every stream,
+                or None when it never reached the threshold; stops the number of observations consumed;
+                posteriors the (N, H) posterior at the stopping point.
+        """
+        matrix, mask = self.padded(streams, mask)
+        n_streams = matrix.shape[0]
+        log_priors = self.log_priors if priors is None else to_log(priors)
+        posteriors = normalize_log(np.broadcast_to(log_priors, (n_streams, self.engine.n_hypos)))
+        log_posteriors = to_log(posteriors)
+        stops = mask.sum(axis=1)
+        winners = np.full(n_streams, -1)
+        decided = posteriors.max(axis=1) >= threshold
+        winners[decided] = posteriors[decided].argmax(axis=1)
+        stops[decided] = 0
+        for t in range(matrix.shape[1]):
+            active = np.flatnonzero(~decided & mask[:, t])
+            if len(active) == 0:
+                if decided.all():
+                    break
+                continue
+            log_posteriors[active] += self.engine.log_columns(matrix[active, t]).T
+            posteriors[active] = normalize_log(log_posteriors[active])
+            best = posteriors[active].argmax(axis=1)
+            done = posteriors[active, best] >= threshold
+            retired = active[done]
+            decided[retired] = True
+            winners[retired] = best[done]
+            stops[retired] = t + 1
+        decisions = [self.hypos[winner] if winner >= 0 else None for winner in winners]
+        return decisions, stops, posteriors
+
+    def predict(self, posteriors):
+        """
+        Propagates posteriors of shape (..., H) one time step through the transition matrix.
+        """
+        if self.transition is None:
+            return posteriors
+        return posteriors @ self.transition
+
+    def forward_filter(self, observations, priors=None):
+        """
+        Calculates the filtered posterior P(hypothesis at t | observations up to t) for every step of one
+        sequence, allowing the hypothesis to move according to self.transition between observations.
+
+        Parameters:
+            observations (list): List of observations
+            priors (list): distribution of the hypothesis at the first observation, defaults to self.priors
+
+        Returns:
+            ndarray: (T, H) matrix with the filtered posterior after every observation
+        """
+        return self.forward_filter_batch([observations], priors=priors)[0]
+
+    def forward_filter_batch(self, sequences, mask=None, priors=None):
+        """
+        Forward filtering of many sequences at once, O(T * H^2) with every step vectorized over the
+        sequences. Each step is rescaled to sum to one, so long sequences do not underflow.
+        self.priors is not changed.
+
+        Parameters:
+            sequences: a list of observation lists (may be ragged), or a padded (N, T) index matrix
+            mask (array): boolean (N, T) matrix of valid entries of a padded matrix
+            priors (array): priors of shape (H,) shared by all sequences, or (N, H). Defaults to self.priors.
+
+        Returns:
+            ndarray: (N, T, H) filtered posteriors; after the end of a sequence its last posterior is repeated
+        """
+        matrix, mask = self.padded(sequences, mask)
+        n_sequences, n_steps = matrix.shape
+        log_priors = self.log_priors if priors is None else to_log(priors)
+        alpha = normalize_log(np.broadcast_to(log_priors, (n_sequences, self.engine.n_hypos)))
+        filtered = np.empty((n_sequences, n_steps, self.engine.n_hypos))
+        for t in range(n_steps):
+            active = mask[:, t]
+            predicted = alpha[active] if t == 0 else self.predict(alpha[active])
+            joint = predicted * self.engine.table[:, matrix[active, t]].T
+            alpha[active] = joint / joint.sum(axis=1, keepdims=True)
+            filtered[:, t] = alpha
+        return filtered
+
+    def fixed_lag_smoother(self, observations, lag, priors=None):
+        """
+        Calculates the fixed-lag smoothed posterior P(hypothesis at t | observations up to t + lag)
+        for every step of one sequence.
+
+        Returns:
+            ndarray: (T, H) matrix with the smoothed posteriors
+        """
+        return self.fixed_lag_smoother_batch([observations], lag, priors=priors)[0]
+
+    def fixed_lag_smoother_batch(self, sequences, lag, mask=None, priors=None):
+        """
+        Fixed-lag smoothing of many sequences at once. The backward messages of all time steps are
+        computed together, one lag step at a time, so the cost is O(T * lag * H^2) vectorized NumPy.
+
+        Parameters:
+            sequences: a list of observation lists (may be ragged), or a padded (N, T) index matrix
+            lag (int): number of future observations taken into account
+            mask (array): boolean (N, T) matrix of valid entries of a padded matrix
+            priors (array): priors of shape (H,) shared by all sequences, or (N, H). Defaults to self.priors.
+
+        Returns:
+            ndarray: (N, T, H) smoothed posteriors
+        """
+        matrix, mask = self.padded(sequences, mask)
+        filtered = self.forward_filter_batch(matrix, mask, priors)
+        n_steps = matrix.shape[1]
+        # emission[n, t] = L[:, o_t], and all ones where the sequence has ended
+        emission = np.moveaxis(self.engine.table[:, matrix], 0, -1)
+        emission = np.where(mask[..., None], emission, 1.0)
+        backward = np.ones_like(filtered)
+        for d in range(min(lag, n_steps - 1), 0, -1):
+            # backward[:, t] becomes the message from observations t+d..t+lag to step t+d-1
+            shifted = np.ones_like(backward)
+            shifted[:, :n_steps - d] = emission[:, d:] * backward[:, :n_steps - d]
+            if self.transition is not None:
+                shifted = shifted @ self.transition.T
+            backward = shifted / shifted.sum(axis=-1, keepdims=True)
+        smoothed = filtered * backward
+        return smoothed / smoothed.sum(axis=-1, keepdims=True)
+
+    def channel_matrix(self, events):
+        """
+        Encodes multi-channel events as an (N, C) index matrix with one column per channel, in the
+        order of self.channels, and -1 for channels that were not observed.
+
+        Parameters:
+            events: list of dicts channel -> observation, or an already encoded (N, C) index matrix
+        """
+        if isinstance(events, np.ndarray) and events.ndim == 2:
+            return events
+        matrix = np.full((len(events), len(self.channels)), -1, dtype=np.intp)
+        for column, (name, engine) in enumerate(self.channels.items()):
+            for row, event in enumerate(events):
+                if name in event:
+                    matrix[row, column] = engine.obs_index[event[name]]
+        return matrix
+
+    def channel_log_likelihood(self, events):
+        """
+        Calculates the joint log-likelihood of every multi-channel event by summing the per-channel log-likelihoods.
+
+        Parameters:
+            events: list of dicts channel -> observation, or an (N, C) index matrix with -1 for missing channels
+
+        Returns:
+            ndarray: (N, H) log-likelihood of every event under every hypothesis
+        """
+        matrix = self.channel_matrix(events)
+        log_likelihood = np.zeros((matrix.shape[0], self.engine.n_hypos))
+        for column, engine in enumerate(self.channels.values()):
+            observed = matrix[:, column] >= 0
+            log_likelihood[observed] += engine.log_columns(matrix[observed, column]).T
+        return log_likelihood
+
+    def posterior_channels_batch(self, events, priors=None):
+        """
+        Calculates the posterior after each multi-channel event on its own, without changing self.priors.
+
+        Returns:
+            ndarray: (N, H) matrix with one posterior per event
+        """
+        log_priors = self.log_priors if priors is None else to_log(priors)
+        return normalize_log(log_priors + self.channel_log_likelihood(events))
+
+    def compute_posterior_channels(self, events):
+        """
+        Calculates the posterior probabilites based on a list of i.i.d. multi-channel events, like
+        compute_posterior does for single observations. Every channel is counted once and
+        contributes counts @ log L.T, so the cost is O(N * C + H * sum of channel vocabularies).
+
+        Parameters:
+            events: list of dicts channel -> observation, or an (N, C) index matrix with -1 for missing channels
+
+        Returns:
+            List: list of posterior probabilities per hypothesis
+        """
+        matrix = self.channel_matrix(events)
+        log_likelihood = np.zeros(self.engine.n_hypos)
+        for column, engine in enumerate(self.channels.values()):
+            codes = matrix[:, column]
+            log_likelihood += engine.count_log_likelihood(engine.counts(codes[codes >= 0]))
+        self.log_priors = self.log_priors + log_likelihood
+        self._priors = None
+        return self.priors
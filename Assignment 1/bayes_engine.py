@@ -0,0 +1,348 @@
+import operator
+
+import numpy as np
+
+
+class RangeIndex:
+    'Read-only hypothesis -> index mapping for hypotheses given as a range, computed instead of stored'
+    def __init__(self, hypos):
+        self.hypos = hypos
+
+    def _key(self, hypothesis):
+        # range.index and `in` are only O(1) for exact ints, so NumPy integers are converted first
+        try:
+            return operator.index(hypothesis)
+        except TypeError:
+            raise KeyError(hypothesis)
+
+    def __getitem__(self, hypothesis):
+        try:
+            return self.hypos.index(self._key(hypothesis))
+        except ValueError:
+            raise KeyError(hypothesis)
+
+    def __contains__(self, hypothesis):
+        try:
+            return self._key(hypothesis) in self.hypos
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self.hypos)
+
+    def __iter__(self):
+        return iter(self.hypos)
+
+
+class BayesEngine:
+    'Vectorized NumPy backend doing the arithmetic for the Bayes class'
+    def __init__(self, hypos, obs, probabilities, chunk_size=None):
+        """
+        The constructor for BayesEngine class.
+
+        Parameters:
+            hypos (list): list of hypotheses
+            obs (list): list of possible observations
+            probabilities (array): A double array returning the probability. The first index is for the hypothesis, the second index for the observation
+            chunk_size (int): when given, the table is never converted as a whole. It may then be an
+                on-disk np.memmap, and every computation runs over blocks of at most chunk_size hypotheses.
+        """
+        # name -> index maps are built once, so lookups no longer scan the lists; hypotheses that are
+        # the row numbers themselves (a range, as from Bayes.from_npy) need no per-row entries
+        if isinstance(hypos, range):
+            self.hypo_index = RangeIndex(hypos)
+        else:
+            self.hypo_index = {hypothesis: i for i, hypothesis in enumerate(hypos)}
+        self.obs_index = {observation: i for i, observation in enumerate(obs)}
+        if chunk_size is None or not isinstance(probabilities, np.ndarray):
+            probabilities = np.asarray(probabilities, dtype=float)
+        self.table = probabilities
+        self.n_hypos, self.n_obs = self.table.shape
+        self.chunk_size = chunk_size or max(self.n_hypos, 1)
+        self.log_table = None
+        if chunk_size is None:
+            self.log_table, self.finite_log_table, self.impossible = self._log_block(self.table)
+
+    @staticmethod
+    def _log_block(block):
+        block = np.asarray(block, dtype=float)
+        with np.errstate(divide='ignore'):
+            log_block = np.log(block)
+        # zero likelihoods are kept apart so 0 * log(0) never turns into nan
+        impossible = block == 0
+        return log_block, np.where(impossible, 0.0, log_block), impossible
+
+    def chunks(self):
+        """
+        Yields slices covering the hypotheses in blocks of at most chunk_size.
+        """
+        for start in range(0, self.n_hypos, self.chunk_size):
+            yield slice(start, min(start + self.chunk_size, self.n_hypos))
+
+    def log_block(self, rows):
+        """
+        Returns log L, log L with zeros instead of -inf, and the mask of zero likelihoods for a slice of hypotheses.
+        """
+        if self.log_table is not None:
+            return self.log_table[rows], self.finite_log_table[rows], self.impossible[rows]
+        return self._log_block(self.table[rows])
+
+    def lookup(self, observation, hypothesis):
+        """
+        Returns P(O|H) for one observation and one hypothesis.
+
+        Raises:
+            KeyError: if the observation or the hypothesis is unknown
+        """
+        return self.table[self.hypo_index[hypothesis], self.obs_index[observation]]
+
+    def obs_indices(self, observations):
+        """
+        Translates a sequence of observations to an integer array of column indices.
+
+        Parameters:
+            observations (iterable): observations from the list of observations
+
+        Returns:
+            ndarray: column index of every observation
+        """
+        return np.fromiter((self.obs_index[observation] for observation in observations), dtype=np.intp)
+
+    def predictive(self, priors, index):
+        """
+        Returns P(O), the probability of observation column `index` under the given priors.
+        """
+        return np.dot(np.asarray(priors, dtype=float), self.table[:, index])
+
+    def update(self, priors, index):
+        """
+        One Bayes update: an elementwise multiply with likelihood column `index` and a normalize.
+
+        Parameters:
+            priors (array): probability of every hypothesis before the observation
+            index (int): column index of the observation
+
+        Returns:
+            ndarray: posterior probability of every hypothesis
+        """
+        joint = np.asarray(priors, dtype=float) * self.table[:, index]
+        return joint / joint.sum()
+
+    def counts(self, indices):
+        """
+        Counts how often every observation column occurs in an index array.
+
+        Returns:
+            ndarray: one count per observation
+        """
+        return np.bincount(indices, minlength=self.n_obs)
+
+    def batch_counts(self, rows, indices, n_sequences):
+        """
+        Counts observation columns per sequence in one bincount.
+
+        Parameters:
+            rows (array): sequence number of every observation
+            indices (array): column index of every observation
+            n_sequences (int): number of sequences
+
+        Returns:
+            ndarray: count matrix of shape (n_sequences, O)
+        """
+        flat = np.asarray(rows, dtype=np.intp) * self.n_obs + np.asarray(indices, dtype=np.intp)
+        return np.bincount(flat, minlength=n_sequences * self.n_obs).reshape(n_sequences, self.n_obs)
+
+    def count_log_likelihood(self, counts, rows=None):
+        """
+        Log-likelihood of i.i.d. observations summarized by their counts, counts @ log L.T.
+
+        A zero likelihood only contributes -inf for observations that actually occurred.
+
+        Parameters:
+            counts (array): observation counts, shape (O,) or (N, O)
+            rows (slice): only compute the given hypotheses, by default all of them chunk by chunk
+
+        Returns:
+            ndarray: log-likelihood per hypothesis, shape (H,) or (N, H)
+        """
+        counts = np.asarray(counts, dtype=float)
+        if rows is None:
+            log_likelihood = np.empty(counts.shape[:-1] + (self.n_hypos,))
+            for rows in self.chunks():
+                log_likelihood[..., rows] = self.count_log_likelihood(counts, rows)
+            return log_likelihood
+        _, finite_log_block, impossible = self.log_block(rows)
+        log_likelihood = counts @ finite_log_block.T
+        if impossible.any():
+            log_likelihood[(counts @ impossible.T) > 0] = -np.inf
+        return log_likelihood
+
+    def log_update(self, log_priors, index):
+        """
+        One Bayes update in log space. The result is left unnormalized.
+
+        Parameters:
+            log_priors (array): log-probability (up to a constant) of every hypothesis
+            index (int): column index of the observation
+
+        Returns:
+            ndarray: unnormalized log-posterior of every hypothesis
+        """
+        return log_priors + self.log_columns(index)
+
+    def log_columns(self, indices):
+        """
+        Returns log L[:, indices], the log-likelihood columns of the given observations.
+        """
+        if self.log_table is not None:
+            return self.log_table[:, indices]
+        return to_log(self.table[:, indices])
+
+    def log_likelihood(self, indices):
+        """
+        Summed log-likelihood of a sequence of observation columns, per hypothesis.
+        Sequences longer than the number of observations are counted first, so the
+        temporary never grows beyond H * O.
+        """
+        if len(indices) > self.n_obs:
+            return self.count_log_likelihood(self.counts(indices))
+        if self.log_table is not None:
+            return self.log_table[:, indices].sum(axis=1)
+        log_likelihood = np.empty(self.n_hypos)
+        for rows in self.chunks():
+            log_likelihood[rows] = to_log(self.table[rows][:, indices]).sum(axis=1)
+        return log_likelihood
+
+    def entropy_terms(self, priors):
+        """
+        For every observation o, computes P(o) = sum_h p_h L_ho and sum_h j_ho log j_ho with j_ho = p_h L_ho,
+        as (p log p) @ L + p @ (L log L). These two matrix products are all that is needed for the entropy
+        of the posterior after every possible observation, block by block over the hypotheses.
+
+        Parameters:
+            priors (array): probabilities of the hypotheses, shape (H,) or (N, H)
+
+        Returns:
+            tuple: (predictive, joint_entropy_sum), both of shape (O,) or (N, O)
+        """
+        priors = np.asarray(priors, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prior_log_prior = np.where(priors > 0, priors * np.log(priors), 0.0)
+        predictive = np.zeros(priors.shape[:-1] + (self.n_obs,))
+        joint_entropy_sum = np.zeros_like(predictive)
+        for rows in self.chunks():
+            block = np.asarray(self.table[rows], dtype=float)
+            _, finite_log_block, _ = self.log_block(rows)
+            predictive += priors[..., rows] @ block
+            joint_entropy_sum += prior_log_prior[..., rows] @ block + priors[..., rows] @ (block * finite_log_block)
+        return predictive, joint_entropy_sum
+
+
+class PosteriorState:
+    'Running state of one observation stream: an unnormalized log-posterior and the number of observations seen'
+    __slots__ = ('log_posterior', 'count')
+
+    def __init__(self, log_posterior, count=0):
+        self.log_posterior = log_posterior
+        self.count = count
+
+    def add(self, log_likelihood, n):
+        """
+        Folds the summed log-likelihood of n new observations into the state.
+        """
+        self.log_posterior = self.log_posterior + log_likelihood
+        self.count += n
+
+    def posterior(self):
+        """
+        Returns the normalized posterior probabilities of the stream so far.
+        """
+        return normalize_log(self.log_posterior)
+
+
+def to_log(priors):
+    """
+    Returns the log of a probability vector, mapping zero probabilities to -inf.
+    """
+    with np.errstate(divide='ignore'):
+        return np.log(np.asarray(priors, dtype=float))
+
+
+def logsumexp(values):
+    """
+    Returns log(sum(exp(values))) of a vector without overflow or underflow.
+    """
+    values = np.asarray(values, dtype=float)
+    shift = np.max(values)
+    if not np.isfinite(shift):
+        return shift
+    return shift + np.log(np.sum(np.exp(values - shift)))
+
+
+def top_indices(log_posterior, k):
+    """
+    Returns the indices of the k largest entries, most probable first. Uses partial selection
+    (argpartition), so only the k selected entries are ever sorted.
+    """
+    log_posterior = np.asarray(log_posterior)
+    k = min(k, len(log_posterior))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    selected = np.argpartition(-log_posterior, k - 1)[:k]
+    return selected[np.argsort(-log_posterior[selected], kind='stable')]
+
+
+def credible_indices(log_posterior, mass, start=16):
+    """
+    Returns the smallest set of indices, most probable first, whose normalized probability reaches mass.
+    The candidate set is grown by doubling k, so the cost is a few partial selections instead of a full sort.
+    """
+    log_posterior = np.asarray(log_posterior, dtype=float)
+    log_norm = logsumexp(log_posterior)
+    k = start
+    while True:
+        selected = top_indices(log_posterior, k)
+        cumulative = np.cumsum(np.exp(log_posterior[selected] - log_norm))
+        if cumulative[-1] >= mass or len(selected) == len(log_posterior):
+            size = min(np.searchsorted(cumulative, mass) + 1, len(selected))
+            return selected[:size]
+        k *= 2
+
+
+def _max_shift(log_posterior):
+    """
+    Returns the maximum over the last axis (kept as an axis), or 0 where it is not finite, to
+    subtract before exponentiating so the largest weight is exp(0).
+    """
+    shift = np.max(log_posterior, axis=-1, keepdims=True)
+    return np.where(np.isfinite(shift), shift, 0.0)
+
+
+def normalized_log_posterior(log_posterior):
+    """
+    Shifts unnormalized log-probabilities so they are log-probabilities summing to one over the last axis.
+
+    Parameters:
+        log_posterior (array): unnormalized log-probabilities, shape (H,) or (N, H)
+
+    Returns:
+        ndarray: normalized log-probabilities
+    """
+    log_posterior = np.asarray(log_posterior, dtype=float)
+    shift = _max_shift(log_posterior)
+    return log_posterior - (shift + np.log(np.sum(np.exp(log_posterior - shift), axis=-1, keepdims=True)))
+
+
+def normalize_log(log_posterior):
+    """
+    Turns unnormalized log-probabilities into probabilities with log-sum-exp over the last axis.
+
+    Parameters:
+        log_posterior (array): unnormalized log-probabilities, shape (H,) or (N, H)
+
+    Returns:
+        ndarray: probabilities summing to one over the last axis
+    """
+    log_posterior = np.asarray(log_posterior, dtype=float)
+    weights = np.exp(log_posterior - _max_shift(log_posterior))
+    return weights / weights.sum(axis=-1, keepdims=True)
@@ -0,0 +1,150 @@
+from itertools import islice
+
+import numpy as np
+
+from bayes import Bayes
+
+
+class LikelihoodCounts:
+    'Accumulates (hypothesis, observation) counts from labeled records, to fit the likelihood table of a Bayes model'
+    def __init__(self, hypos, obs, counts=None):
+        """
+        The constructor for LikelihoodCounts class.
+
+        Parameters:
+            hypos (list): list of hypotheses
+            obs (list): list of possible observations
+            counts (array): (H, O) count table to start from, zeros when omitted
+        """
+        self.hypos = list(hypos)
+        self.obs = list(obs)
+        self.hypo_index = {hypothesis: i for i, hypothesis in enumerate(self.hypos)}
+        self.obs_index = {observation: i for i, observation in enumerate(self.obs)}
+        if counts is None:
+            counts = np.zeros((len(self.hypos), len(self.obs)), dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    def add_indices(self, hypo_indices, obs_indices):
+        """
+        Adds a chunk of records given as integer arrays, with one bincount over the flattened (H, O) table.
+        """
+        n_hypos, n_obs = self.counts.shape
+        flat = np.asarray(hypo_indices, dtype=np.intp) * n_obs + np.asarray(obs_indices, dtype=np.intp)
+        self.counts += np.bincount(flat, minlength=n_hypos * n_obs).reshape(n_hypos, n_obs)
+        return self
+
+    def add_records(self, records, chunk_size=1000000):
+        """
+        Adds (hypothesis, observation) records from any iterable, e.g. read_records(path).
+        Records are consumed chunk by chunk, so the stream is never held in memory.
+
+        Parameters:
+            records (iterable): (hypothesis, observation) pairs
+            chunk_size (int): number of records translated and counted at once
+
+        Raises:
+            KeyError: if a record holds an unknown hypothesis or observation
+        """
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return self
+            hypo_indices = np.fromiter((self.hypo_index[hypothesis] for hypothesis, _ in chunk), dtype=np.intp, count=len(chunk))
+            obs_indices = np.fromiter((self.obs_index[observation] for _, observation in chunk), dtype=np.intp, count=len(chunk))
+            self.add_indices(hypo_indices, obs_indices)
+
+    def merge(self, other):
+        """
+        Adds the counts of another LikelihoodCounts, e.g. one filled by a parallel worker.
+
+        Raises:
+            ValueError: if the two count tables use different hypotheses or observations
+        """
+        if self.hypos != other.hypos or self.obs != other.obs:
+            raise ValueError("Cannot merge counts over different hypotheses or observations")
+        self.counts += other.counts
+        return self
+
+    def __add__(self, other):
+        return LikelihoodCounts(self.hypos, self.obs, self.counts.copy()).merge(other)
+
+    def save(self, path):
+        """
+        Stores the count table in a .npz file, so partial tables can be merged by another process.
+        """
+        np.savez(path, counts=self.counts, hypos=np.array(self.hypos, dtype=object), obs=np.array(self.obs, dtype=object))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a count table stored with save.
+        """
+        with np.load(path, allow_pickle=True) as data:
+            return cls(data['hypos'].tolist(), data['obs'].tolist(), data['counts'])
+
+    def likelihood(self, alpha=1.0):
+        """
+        Returns the fitted likelihood table P(O|H) with Dirichlet smoothing.
+
+        Parameters:
+            alpha (float or array): pseudo-count added to every cell; a length O array or an (H, O)
+                array gives a separate pseudo-count per observation or per cell
+
+        Returns:
+            ndarray: (H, O) likelihood table whose rows sum to one
+        """
+        smoothed = self.counts + np.asarray(alpha, dtype=float)
+        return smoothed / smoothed.sum(axis=1, keepdims=True)
+
+    def priors(self, alpha=1.0):
+        """
+        Returns the hypothesis frequencies of the records with Dirichlet smoothing, as a list of priors.
+        """
+        smoothed = self.counts.sum(axis=1) + np.asarray(alpha, dtype=float)
+        return (smoothed / smoothed.sum()).tolist()
+
+    def to_bayes(self, alpha=1.0, priors=None, prior_alpha=1.0):
+        """
+        Builds a ready-to-use Bayes model from the counts.
+
+        Parameters:
+            alpha (float or array): pseudo-counts of the likelihood table, see likelihood
+            priors (list): priors of the model, by default the smoothed hypothesis frequencies
+            prior_alpha (float): pseudo-count of the default priors
+
+        Returns:
+            Bayes: model with the fitted likelihood table
+        """
+        if priors is None:
+            priors = self.priors(prior_alpha)
+        return Bayes(self.hypos, priors, self.obs, self.likelihood(alpha))
+
+
+def read_records(path, delimiter=','):
+    """
+    Streams (hypothesis, observation) records from a text file with one 'hypothesis,observation' line per record.
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                hypothesis, observation = line.split(delimiter, 1)
+                yield hypothesis.strip(), observation.strip()
+
+
+def fit(records, hypos, obs, alpha=1.0, chunk_size=1000000):
+    """
+    Fits a Bayes model to (hypothesis, observation) records in one pass.
+
+    Parameters:
+        records (iterable): (hypothesis, observation) pairs, e.g. read_records(path)
+        hypos (list): list of hypotheses
+        obs (list): list of possible observations
+        alpha (float or array): Dirichlet pseudo-counts of the likelihood table
+        chunk_size (int): number of records counted at once
+
+    Returns:
+        Bayes: the fitted model
+    """
+    return LikelihoodCounts(hypos, obs).add_records(records, chunk_size).to_bayes(alpha)
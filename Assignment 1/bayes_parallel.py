@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from bayes_engine import BayesEngine, logsumexp
+
+
+def _attach(spec):
+    """
+    Opens an array described by a spec tuple in a worker. Returns the array and the SharedMemory
+    handle that keeps it alive (None for memory-mapped files).
+    """
+    kind, location, dtype, shape, offset = spec
+    if kind == 'memmap':
+        return np.memmap(location, dtype=dtype, mode='r', offset=offset, shape=shape), None
+    block = shared_memory.SharedMemory(name=location)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf), block
+
+
+def _shard_log_posterior(table_spec, out_spec, start, stop, log_priors, counts, chunk_size):
+    """
+    Worker task: writes the unnormalized log-posterior of hypotheses [start, stop) into the shared
+    output vector and returns the log-sum-exp of the shard.
+    """
+    table, table_block = _attach(table_spec)
+    out, out_block = _attach(out_spec)
+    try:
+        for first in range(start, stop, chunk_size):
+            rows = slice(first, min(first + chunk_size, stop))
+            _, finite_log_block, impossible = BayesEngine._log_block(table[rows])
+            log_posterior = log_priors[rows.start - start:rows.stop - start] + finite_log_block @ counts
+            log_posterior[(impossible @ counts) > 0] = -np.inf
+            out[rows] = log_posterior
+        return logsumexp(out[start:stop])
+    finally:
+        del table, out
+        for block in (table_block, out_block):
+            if block is not None:
+                block.close()
+
+
+class ShardedEngine:
+    'Evaluates posteriors of a BayesEngine over hypothesis shards in a process pool'
+    def __init__(self, engine, workers=None, shards=None):
+        """
+        The constructor for ShardedEngine class. The likelihood table is placed in shared memory once
+        (memory-mapped tables are reopened from their file instead), so tasks never pickle it.
+
+        Parameters:
+            engine (BayesEngine): engine holding the likelihood table
+            workers (int): number of worker processes, os.cpu_count() by default
+            shards (int): number of hypothesis shards, the number of workers by default
+        """
+        self.engine = engine
+        self.workers = workers or os.cpu_count()
+        self.shards = min(shards or self.workers, max(engine.n_hypos, 1))
+        self._blocks = []
+        table = engine.table
+        if isinstance(table, np.memmap) and table.filename is not None:
+            self.table_spec = ('memmap', table.filename, table.dtype.str, table.shape, table.offset)
+        else:
+            self.table_spec, _ = self._share(table)
+        self.out_spec, self.out = self._share(np.empty(engine.n_hypos))
+        self.pool = ProcessPoolExecutor(self.workers)
+
+    def _share(self, array):
+        array = np.ascontiguousarray(array, dtype=float)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        self._blocks.append(block)
+        return ('shm', block.name, array.dtype.str, array.shape, 0), shared
+
+    def log_posterior(self, log_priors, counts):
+        """
+        Computes the normalized log-posterior log prior + counts @ log L.T, shard by shard.
+        Every shard returns its own log-sum-exp and these are combined exactly into the global normalizer.
+
+        Parameters:
+            log_priors (array): log-probability (up to a constant) of every hypothesis
+            counts (array): number of times every observation occurred
+
+        Returns:
+            ndarray: normalized log-posterior of every hypothesis
+        """
+        log_priors = np.asarray(log_priors, dtype=float)
+        counts = np.asarray(counts, dtype=float)
+        bounds = np.linspace(0, self.engine.n_hypos, self.shards + 1).astype(int)
+        futures = [self.pool.submit(_shard_log_posterior, self.table_spec, self.out_spec, start, stop,
+                                    log_priors[start:stop], counts, self.engine.chunk_size)
+                   for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        log_norm = logsumexp([future.result() for future in futures])
+        return self.out - log_norm
+
+    def close(self):
+        """
+        Shuts the pool down and releases the shared memory.
+        """
+        self.pool.shutdown()
+        self.out = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from bayes_engine import normalized_log_posterior, to_log
+
+
+class ModelSessions:
+    'Log-posteriors of all sessions of one read-only Bayes model, stored as rows of a single array'
+    def __init__(self, model, capacity=16):
+        """
+        The constructor for ModelSessions class.
+
+        Parameters:
+            model (Bayes): the shared model; only its engine and log_priors are read
+            capacity (int): number of session rows allocated up front; the array doubles when they are used up
+        """
+        self.model = model
+        self.log_posteriors = np.empty((capacity, model.engine.n_hypos))
+        self.rows = {}
+        # popped from the end, so rows are handed out in order 0, 1, 2, ...
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def open(self, session_id, priors=None):
+        """
+        Gives a session a free row, starting at the normalized log of its priors.
+
+        Parameters:
+            session_id: any hashable id of the session
+            priors (list): priors of the session, the model's current priors when omitted
+
+        Raises:
+            ValueError: if the session is already open, or priors does not hold one probability per hypothesis
+        """
+        if session_id in self.rows:
+            raise ValueError('session %r is already open' % (session_id,))
+        if priors is not None and len(priors) != self.log_posteriors.shape[1]:
+            raise ValueError('expected %d priors, got %d' % (self.log_posteriors.shape[1], len(priors)))
+        if not self.free:
+            capacity = len(self.log_posteriors)
+            self.log_posteriors = np.concatenate([self.log_posteriors, np.empty_like(self.log_posteriors)])
+            self.free = list(range(2 * capacity - 1, capacity - 1, -1))
+        row = self.free.pop()
+        log_priors = self.model.log_priors if priors is None else to_log(priors)
+        self.log_posteriors[row] = normalized_log_posterior(log_priors)
+        self.rows[session_id] = row
+
+    def close(self, session_id):
+        """
+        Frees the row of a session, to be reused by the next session that is opened.
+
+        Raises:
+            KeyError: if the session is not open
+        """
+        self.free.append(self.rows.pop(session_id))
+
+
+class ServiceStats:
+    'Latency and throughput counters of a PosteriorService'
+    def __init__(self):
+        """
+        The constructor for ServiceStats class. Throughput is measured from this moment on.
+        """
+        self.started = time.perf_counter()
+        self.updates = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, n_updates, latencies):
+        """
+        Adds one flushed micro-batch to the counters.
+
+        Parameters:
+            n_updates (int): number of updates in the micro-batch
+            latencies (list): seconds every update waited between its arrival and the flush
+        """
+        self.updates += n_updates
+        self.batches += 1
+        self.total_latency += sum(latencies)
+        self.max_latency = max(self.max_latency, max(latencies))
+
+    def as_dict(self):
+        """
+        Returns:
+            Dict: update and batch counts, mean batch size, mean and max latency in ms, and updates per second
+        """
+        elapsed = time.perf_counter() - self.started
+        return {
+            'updates': self.updates,
+            'batches': self.batches,
+            'mean_batch_size': self.updates / self.batches if self.batches else 0.0,
+            'mean_latency_ms': 1000 * self.total_latency / self.updates if self.updates else 0.0,
+            'max_latency_ms': 1000 * self.max_latency,
+            'throughput_per_s': self.updates / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class PosteriorService:
+    'Serves posterior updates of many concurrent sessions against a few shared Bayes models'
+    def __init__(self, models, window=0.002, max_batch=4096):
+        """
+        The constructor for PosteriorService class. The models are only read; every session is a
+        single row of log-posteriors, so sessions are cheap and the models can be shared.
+
+        Parameters:
+            models (dict): model name -> Bayes
+            window (float): seconds during which updates are collected into one micro-batch
+            max_batch (int): a micro-batch is flushed early once it holds this many updates
+        """
+        self.models = {name: ModelSessions(model) for name, model in models.items()}
+        self.window = window
+        self.max_batch = max_batch
+        self.session_models = {}
+        self.pending = {name: [] for name in self.models}
+        self.timers = {}
+        self.stats = ServiceStats()
+
+    def open_session(self, session_id, model, priors=None):
+        """
+        Starts a session on a model, from the model's priors unless others are given.
+
+        Raises:
+            ValueError: if a session with this id is already open, on any model
+        """
+        if session_id in self.session_models:
+            raise ValueError('session %r is already open' % (session_id,))
+        self.models[model].open(session_id, priors)
+        self.session_models[session_id] = model
+
+    def close_session(self, session_id):
+        """
+        Ends a session. Its updates that are still waiting for a micro-batch are dropped, and their
+        callers get a RuntimeError, so the freed row can safely be reused by a new session.
+        """
+        name = self.session_models.pop(session_id)
+        row = self.models[name].rows[session_id]
+        self.models[name].close(session_id)
+        kept = []
+        for entry in self.pending[name]:
+            if entry[0] == row:
+                if not entry[2].done():
+                    entry[2].set_exception(RuntimeError('session %r was closed' % (session_id,)))
+            else:
+                kept.append(entry)
+        self.pending[name] = kept
+
+    def posterior(self, session_id):
+        """
+        Returns the current posterior probabilities of a session as a list.
+        """
+        sessions = self.models[self.session_models[session_id]]
+        return np.exp(sessions.log_posteriors[sessions.rows[session_id]]).tolist()
+
+    async def update(self, session_id, observation):
+        """
+        Adds one observation to a session. Updates arriving within the batching window are applied
+        together in one vectorized call.
+
+        Returns:
+            List: posterior of the session after the micro-batch holding this update
+        """
+        name = self.session_models[session_id]
+        sessions = self.models[name]
+        index = sessions.model.engine.obs_index[observation]
+        future = asyncio.get_running_loop().create_future()
+        self.pending[name].append((sessions.rows[session_id], index, future, time.perf_counter()))
+        if len(self.pending[name]) >= self.max_batch:
+            self.flush(name)
+        elif name not in self.timers:
+            self.timers[name] = asyncio.get_running_loop().call_later(self.window, self.flush, name)
+        return await future
+
+    def flush(self, name):
+        """
+        Applies all pending updates of one model as a single vectorized log-space update.
+        If that fails, the error is passed on to every update of the micro-batch.
+        """
+        timer = self.timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+        batch, self.pending[name] = self.pending[name], []
+        if not batch:
+            return
+        rows, indices, futures, arrivals = zip(*batch)
+        try:
+            sessions = self.models[name]
+            touched, inverse = np.unique(np.array(rows, dtype=np.intp), return_inverse=True)
+            log_likelihood = np.zeros((len(touched), sessions.model.engine.n_hypos))
+            np.add.at(log_likelihood, inverse, sessions.model.engine.log_columns(np.array(indices)).T)
+            sessions.log_posteriors[touched] = normalized_log_posterior(sessions.log_posteriors[touched] + log_likelihood)
+            posteriors = np.exp(sessions.log_posteriors[touched])
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        now = time.perf_counter()
+        for future, i in zip(futures, inverse):
+            if not future.done():
+                future.set_result(posteriors[i].tolist())
+        self.stats.record(len(batch), [now - arrival for arrival in arrivals])
+
+    async def handle(self, message):
+        """
+        Executes one request message (a dict with an 'op' key) and returns the reply as a dict.
+        Used by the socket transport, but can be called in-process as well.
+        """
+        try:
+            op = message['op']
+            if op == 'open':
+                self.open_session(message['session'], message['model'], message.get('priors'))
+                return {'ok': True}
+            if op == 'close':
+                self.close_session(message['session'])
+                return {'ok': True}
+            if op == 'update':
+                return {'posterior': await self.update(message['session'], message['observation'])}
+            if op == 'posterior':
+                return {'posterior': self.posterior(message['session'])}
+            if op == 'stats':
+                return self.stats.as_dict()
+            return {'error': 'unknown op %r' % op}
+        except KeyError as e:
+            return {'error': 'unknown key %s' % e}
+        except Exception as e:
+            # any bad request gets an error reply, so the connection keeps answering in order
+            return {'error': '%s: %s' % (type(e).__name__, e)}
+
+    async def serve_connection(self, reader, writer):
+        """
+        Socket transport: newline-delimited JSON requests, answered in order with one JSON line each.
+        """
+        replies = asyncio.Queue()
+
+        async def write_replies():
+            while True:
+                reply = await replies.get()
+                if reply is None:
+                    return
+                writer.write((json.dumps(await reply) + '\n').encode())
+                await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_replies())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    reply = asyncio.get_running_loop().create_future()
+                    reply.set_result({'error': 'invalid JSON: %s' % e})
+                    replies.put_nowait(reply)
+                    continue
+                # requests are handled concurrently, so pipelined updates land in one micro-batch
+                replies.put_nowait(asyncio.ensure_future(self.handle(message)))
+        finally:
+            replies.put_nowait(None)
+            await writer_task
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """
+        Starts the socket transport. Returns the asyncio server.
+        """
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+class PosteriorClient:
+    'Client for the socket transport of PosteriorService'
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, **message):
+        self.writer.write((json.dumps(message) + '\n').encode())
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
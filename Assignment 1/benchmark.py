@@ -0,0 +1,189 @@
+"""
+Benchmark of the two Bayes implementations (bayes.py and FrancescaAssignment/Class_Bayes.py).
+
+Runs the cookie and archery problems and synthetic problems of growing size through every engine,
+reports per-update latency, throughput and peak memory, and checks that all engines agree on the
+posterior. Exits with status 1 when they do not.
+
+Usage:
+    python benchmark.py [--sizes small|medium|large] [--repeat 3] [--seed 0]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'FrancescaAssignment'))
+sys.path.insert(0, HERE)
+
+from bayes import Bayes
+import Class_Bayes
+
+# synthetic problem sizes (H, O, N) per --sizes option; every option also runs the smaller ones
+# long streams collapse the posterior onto one hypothesis, so every option also has short streams
+# whose posteriors stay spread out
+SIZES = {
+    'small': [(10, 5, 3), (100, 10, 10), (10, 5, 100), (100, 10, 1000)],
+    'medium': [(1000, 20, 20), (1000, 20, 10000), (10000, 50, 100000)],
+    'large': [(100000, 50, 10), (100000, 50, 1000000), (1000000, 20, 1000000)],
+}
+# the pure Python engines are only run while H * H * N stays below this budget
+PURE_PYTHON_BUDGET = 10 ** 7
+# posteriors are compared by relative error, on the entries that are not negligible in both
+TOLERANCE = 1e-9
+NEGLIGIBLE = 1e-250
+
+
+def example_problems():
+    """
+    Returns the cookie and archery problems as defined by main.py and ArcheryProblem.py.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):  # the example scripts print their answers on import
+        import main
+        import ArcheryProblem
+    cookie = dict(name='cookie', hypos=main.hypos, priors=[0.5, 0.5], obs=main.obs,
+                  table=main.likelihood, observations=['chocolate', 'vanilla'])
+    archery = dict(name='archery', hypos=ArcheryProblem.list_hypo, priors=ArcheryProblem.list_priors,
+                   obs=ArcheryProblem.list_obs, table=ArcheryProblem.list_likelihood,
+                   observations=ArcheryProblem.observed)
+    return [cookie, archery]
+
+
+def synthetic_problem(n_hypos, n_obs, n_observations, rng):
+    """
+    Returns a random problem with H hypotheses, O observations and a stream of N observations
+    drawn from one of the hypotheses.
+    """
+    table = rng.dirichlet(np.ones(n_obs), n_hypos)
+    priors = rng.dirichlet(np.ones(n_hypos))
+    truth = rng.integers(n_hypos)
+    observations = rng.choice(n_obs, size=n_observations, p=table[truth]).tolist()
+    return dict(name='synthetic H=%d O=%d N=%d' % (n_hypos, n_obs, n_observations),
+                hypos=list(range(n_hypos)), priors=priors.tolist(), obs=list(range(n_obs)),
+                table=table, observations=observations)
+
+
+def bayes_sequential(problem):
+    model = Bayes(problem['hypos'], problem['priors'], problem['obs'], problem['table'])
+    return model.compute_posterior(problem['observations'])
+
+
+def bayes_counts(problem):
+    model = Bayes(problem['hypos'], problem['priors'], problem['obs'], problem['table'])
+    return model.compute_posterior(problem['observations'], use_counts=True)
+
+
+def bayes_stream(problem):
+    model = Bayes(problem['hypos'], problem['priors'], problem['obs'], problem['table'])
+    posterior = model.priors
+    for posterior in model.stream_posterior(problem['observations'], every=1000):
+        pass
+    return posterior
+
+
+def class_bayes_chained(problem):
+    # Class_Bayes.compute_posterior does not chain, so chain single_posterior_update by hand
+    model = Class_Bayes.Bayes(problem['hypos'], problem['priors'], problem['obs'], np.asarray(problem['table']).tolist())
+    for observation in problem['observations']:
+        model.list_priors = model.single_posterior_update(observation, model.list_priors)
+    return model.list_priors
+
+
+def class_bayes_counts(problem):
+    model = Class_Bayes.Bayes(problem['hypos'], problem['priors'], problem['obs'], problem['table'])
+    return model.compute_posterior_counts(problem['observations'])
+
+
+ENGINES = [
+    ('bayes.sequential', bayes_sequential, False),
+    ('bayes.counts', bayes_counts, False),
+    ('bayes.stream', bayes_stream, False),
+    ('class_bayes.chained', class_bayes_chained, True),
+    ('class_bayes.counts', class_bayes_counts, False),
+]
+
+
+def relative_difference(posterior, reference):
+    """
+    Returns the largest relative difference between two posteriors, over the entries where at
+    least one of them is above NEGLIGIBLE. Unlike an absolute difference, this also notices
+    changes of the small probabilities of a posterior that is close to one-hot.
+    """
+    scale = np.maximum(np.abs(posterior), np.abs(reference))
+    significant = scale > NEGLIGIBLE
+    if not significant.any():
+        return 0.0
+    return np.max(np.abs(posterior - reference)[significant] / scale[significant])
+
+
+def measure(engine, problem, repeat):
+    """
+    Runs an engine on a problem. Returns the posterior, the best wall time over repeat runs,
+    and the peak memory traced during one extra run.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        posterior = engine(problem)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    engine(problem)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return np.asarray(posterior, dtype=float), best, peak
+
+
+def run(problems, repeat):
+    """
+    Benchmarks every engine on every problem and prints one line per run.
+
+    Returns:
+        bool: True when all engines agree with bayes.sequential within TOLERANCE (relative)
+    """
+    agree = True
+    print('%-36s %-20s %14s %16s %12s %10s' % ('problem', 'engine', 'us/update', 'updates/s', 'peak MiB', 'max rel diff'))
+    for problem in problems:
+        n_hypos = len(problem['hypos'])
+        n_updates = max(len(problem['observations']), 1)
+        reference = None
+        for name, engine, pure_python in ENGINES:
+            if pure_python and n_hypos * n_hypos * n_updates > PURE_PYTHON_BUDGET:
+                print('%-36s %-20s %14s' % (problem['name'], name, 'skipped'))
+                continue
+            posterior, seconds, peak = measure(engine, problem, repeat)
+            if reference is None:
+                reference = posterior
+            diff = relative_difference(posterior, reference)
+            agree = agree and diff <= TOLERANCE
+            print('%-36s %-20s %14.3f %16.0f %12.2f %10.1e%s' % (
+                problem['name'], name, 1e6 * seconds / n_updates, n_updates / seconds,
+                peak / 2 ** 20, diff, '' if diff <= TOLERANCE else '  MISMATCH'))
+    return agree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', choices=list(SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = []
+    for option in SIZES:
+        sizes += SIZES[option]
+        if option == args.sizes:
+            break
+    problems = example_problems() + [synthetic_problem(*size, rng) for size in sizes]
+    if not run(problems, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# episode_recorder.py
+# Headless episode recording: steps are stored as small integer/float arrays in a ring buffer
+# while training, and only turned into (ansi) frames when an episode is inspected afterwards.
+
+import sys
+
+import numpy as np
+
+from simple_grid import render_ansi
+
+NO_ACTION = -1
+
+
+class EpisodeRecorder(object):
+    """
+    Ring buffer holding the last `capacity` recorded steps. Every entry is one frame: the state
+    after the step, the action that led to it (NO_ACTION for the start state of an episode),
+    the reward, done, and the number of the episode it belongs to. Older entries are overwritten,
+    so an old episode may only be partly available.
+    """
+
+    def __init__(self, desc, capacity=100000):
+        """ :param desc: map of the environment, used to render frames (e.g. env.desc)
+            :param capacity: number of steps kept
+        """
+        self.desc = np.asarray(desc, dtype='c')
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.full(capacity, NO_ACTION, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.episode_ids = np.full(capacity, -1, dtype=np.int64)
+        self.n = 0  # number of frames written so far; the next one goes into slot n % capacity
+        self.episode = -1
+
+    def _write(self, state, action, reward, done):
+        i = self.n % self.capacity
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.episode_ids[i] = self.episode
+        self.n += 1
+
+    def start(self, state, episode=None):
+        """ Starts a new episode in the given start state. """
+        self.episode = self.episode + 1 if episode is None else episode
+        self._write(state, NO_ACTION, 0.0, False)
+
+    def record(self, action, state, reward, done):
+        """ Records one step: the action taken and the resulting state, reward and done. """
+        self._write(state, action, reward, done)
+
+    def _slots(self, episode):
+        """ Buffer slots of an episode, in the order in which they were written. """
+        first = max(self.n - self.capacity, 0)
+        order = np.arange(first, self.n) % self.capacity
+        return order[self.episode_ids[order] == episode]
+
+    def episodes(self):
+        """ Numbers of the episodes that still have frames in the buffer. """
+        return np.unique(self.episode_ids[:min(self.n, self.capacity)])
+
+    def trajectory(self, episode):
+        """ :return: states, actions, rewards and dones of the frames of an episode """
+        slots = self._slots(episode)
+        return self.states[slots], self.actions[slots], self.rewards[slots], self.dones[slots]
+
+    def frames(self, episode):
+        """ Renders the frames of an episode to ansi text, as env.render(mode='ansi') would have. """
+        states, actions, _, _ = self.trajectory(episode)
+        for s, a in zip(states, actions):
+            yield render_ansi(self.desc, s, None if a == NO_ACTION else a)
+
+    def replay(self, episode, outfile=None):
+        """ Writes the frames of an episode to outfile: a file name, an open file, or stdout by default. """
+        if isinstance(outfile, str):
+            with open(outfile, 'w') as f:
+                return self.replay(episode, f)
+        outfile = sys.stdout if outfile is None else outfile
+        for frame in self.frames(episode):
+            outfile.write(frame)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# planning.py
+# Value iteration and policy iteration for simple_grid maps, used to compute the optimal
+# V*, Q* and policy that a tabular QLearner should converge to.
+
+import numpy as np
+
+from q_learning_skeleton import DEFAULT_DISCOUNT
+
+
+class BellmanModel:
+    """
+    The parts of an MDP needed for Bellman backups:
+
+        Q(s, a) = expected_reward[s, a] + discount * sum_s' C_a[s, s'] V(s')
+
+    where C_a[s, s'] is the probability of moving from s to s' *without* the episode ending
+    (terminal outcomes contribute their reward only). C is either given by the dense
+    (nS, nA, K) transition arrays of DrunkenWalkEnv or by its sparse per-action matrices.
+    """
+
+    def __init__(self, expected_reward, next_state=None, stay_prob=None, matrices=None):
+        self.expected_reward = expected_reward
+        self.nS, self.nA = expected_reward.shape
+        self.next_state = next_state
+        self.stay_prob = stay_prob
+        self.matrices = matrices
+
+    @classmethod
+    def from_arrays(cls, next_state, prob, reward, done):
+        """ Builds the model from dense (nS, nA, K) transition arrays. """
+        return cls((prob * reward).sum(axis=2), next_state=next_state, stay_prob=prob * ~done)
+
+    @classmethod
+    def from_env(cls, env):
+        """ Builds the model from a DrunkenWalkEnv, dense or sparse. """
+        if getattr(env, 'sparse', False):
+            return cls(env.expected_reward, matrices=env.transition_matrices)
+        return cls.from_arrays(env.next_state, env.trans_prob, env.trans_reward, env.trans_done)
+
+    def continuation(self, V):
+        """ Returns sum_s' C_a[s, s'] V(s') for all states and actions, shape (nS, nA). """
+        if self.matrices is not None:
+            return np.stack([m @ V for m in self.matrices], axis=1)
+        return (self.stay_prob * V[self.next_state]).sum(axis=2)
+
+    def q_values(self, V, discount):
+        return self.expected_reward + discount * self.continuation(V)
+
+    def policy_matrix(self, policy):
+        """ Returns the sparse (nS, nS) matrix C_pi of a deterministic policy. Requires scipy. """
+        from scipy import sparse
+
+        states = np.arange(self.nS)
+        if self.matrices is not None:
+            rows = [m[states[policy == a]] for a, m in enumerate(self.matrices)]
+            order = np.concatenate([states[policy == a] for a in range(self.nA)])
+            stacked = sparse.vstack(rows).tocsr()
+            return stacked[np.argsort(order)]
+        K = self.next_state.shape[2]
+        data = self.stay_prob[states, policy].ravel()
+        cols = self.next_state[states, policy].ravel()
+        return sparse.csr_matrix((data, (np.repeat(states, K), cols)), shape=(self.nS, self.nS))
+
+
+def as_model(env_or_model):
+    if isinstance(env_or_model, BellmanModel):
+        return env_or_model
+    if isinstance(env_or_model, tuple):
+        return BellmanModel.from_arrays(*env_or_model)
+    return BellmanModel.from_env(env_or_model)
+
+
+def greedy_policy(Q):
+    """ Greedy policy of a Q table (ties go to the lowest action index). """
+    return np.argmax(Q, axis=1)
+
+
+def value_iteration(env, discount=DEFAULT_DISCOUNT, tol=1e-8, max_iter=100000, V0=None):
+    """
+    Value iteration with vectorized Bellman backups over all states and actions.
+
+    :param env: a DrunkenWalkEnv, its (next_state, prob, reward, done) arrays, or a BellmanModel
+    :param discount: discount factor
+    :param tol: stop when the largest change of V in one sweep is below tol
+    :param max_iter: maximum number of sweeps
+    :param V0: initial value function (warm start), zeros by default
+    :return: V*, Q* and the greedy policy
+    """
+    model = as_model(env)
+    V = np.zeros(model.nS) if V0 is None else np.array(V0, dtype=float)
+    for _ in range(max_iter):
+        Q = model.q_values(V, discount)
+        V_new = Q.max(axis=1)
+        delta = np.max(np.abs(V_new - V))
+        V = V_new
+        if delta < tol:
+            break
+    Q = model.q_values(V, discount)
+    return V, Q, greedy_policy(Q)
+
+
+def policy_evaluation(env, policy, discount=DEFAULT_DISCOUNT, exact=True, tol=1e-8, max_iter=100000, V0=None):
+    """
+    Evaluates a deterministic policy.
+
+    :param exact: solve (I - discount * C_pi) V = R_pi with a sparse linear solve (requires scipy,
+                  meant for small and medium maps); otherwise iterate backups until the change is below tol
+    :param V0: initial value function for the iterative evaluation
+    :return: V of the policy
+    """
+    model = as_model(env)
+    policy = np.asarray(policy)
+    reward = model.expected_reward[np.arange(model.nS), policy]
+    if exact:
+        from scipy import sparse
+        from scipy.sparse.linalg import spsolve
+
+        A = sparse.identity(model.nS, format='csr') - discount * model.policy_matrix(policy)
+        return spsolve(A.tocsc(), reward)
+    V = np.zeros(model.nS) if V0 is None else np.array(V0, dtype=float)
+    states = np.arange(model.nS)
+    for _ in range(max_iter):
+        V_new = reward + discount * model.continuation(V)[states, policy]
+        delta = np.max(np.abs(V_new - V))
+        V = V_new
+        if delta < tol:
+            break
+    return V
+
+
+def policy_iteration(env, discount=DEFAULT_DISCOUNT, policy0=None, exact=True, tol=1e-8, max_iter=1000):
+    """
+    Policy iteration: evaluate the policy, make it greedy, repeat until it is stable.
+
+    :param env: a DrunkenWalkEnv, its (next_state, prob, reward, done) arrays, or a BellmanModel
+    :param policy0: initial policy (warm start), e.g. the greedy policy of a learned Q table
+    :param exact: evaluate policies with a sparse linear solve (see policy_evaluation)
+    :return: V*, Q* and the optimal policy
+    """
+    model = as_model(env)
+    policy = np.zeros(model.nS, dtype=int) if policy0 is None else np.array(policy0, dtype=int)
+    V = None
+    for _ in range(max_iter):
+        V = policy_evaluation(model, policy, discount, exact=exact, tol=tol, V0=V)
+        Q = model.q_values(V, discount)
+        # only switch actions that are strictly better, so ties cannot make the policy cycle
+        current = Q[np.arange(model.nS), policy]
+        improved = Q.max(axis=1) > current + tol
+        if not improved.any():
+            break
+        policy = np.where(improved, greedy_policy(Q), policy)
+    Q = model.q_values(V, discount)
+    return V, Q, policy
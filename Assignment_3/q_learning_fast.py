@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# q_learning_fast.py
+# Fused training loop for QLearner on DrunkenWalkEnv / GridWorld: whole episodes are run in one
+# tight loop that samples transitions straight from the precomputed transition arrays and alias
+# tables, without calling env.step, agent.select_action or agent.process_experience.
+
+import time
+
+import numpy as np
+
+import q_learning_skeleton
+from simple_grid import MAX_OUTCOMES, alias_tables, transition_arrays
+
+RANDOM_BLOCK = 65536
+
+
+def fused_act_loop(env, agent, num_episodes, max_episode_length=None, seed=None, verbose=True):
+    """
+    Drop-in alternative to q_learning_main.act_loop. Applies exactly the updates of
+    QLearner.process_experience (with the module's LEARNINGRATE and DEFAULT_DISCOUNT) and the
+    action selection of QLearner.select_action (EPSILON exploration, random tie-breaking), but
+    draws its random numbers from its own generator, so episodes differ from act_loop's.
+
+    :param max_episode_length: MAX_EPISODE_LENGTH by default
+    :param seed: seed of the random generator
+    :param verbose: print the number of episodes per second at the end
+    :return: dict with the return and length of every episode and episodes_per_sec;
+             agent.ql holds the learned Q table
+    """
+    epsilon = q_learning_skeleton.EPSILON
+    lr = q_learning_skeleton.LEARNINGRATE
+    discount = q_learning_skeleton.DEFAULT_DISCOUNT
+    if max_episode_length is None:
+        max_episode_length = q_learning_skeleton.MAX_EPISODE_LENGTH
+
+    if getattr(env, 'sparse', False):
+        next_state, prob, reward, done = transition_arrays(env.desc)
+        accept, alias = alias_tables(prob)
+    else:
+        next_state, reward, done = env.next_state, env.trans_reward, env.trans_done
+        accept, alias = env.alias_accept, env.alias_index
+    # plain Python lists are much faster than NumPy for the scalar accesses of the loop
+    next_state, reward, done, accept, alias = (x.tolist() for x in (next_state, reward, done, accept, alias))
+    cum_isd = np.cumsum(env.isd)
+    num_actions = agent.ql.shape[1]
+    q = agent.ql.tolist()
+
+    rng = np.random.RandomState(seed)
+    returns = np.zeros(num_episodes)
+    lengths = np.zeros(num_episodes, dtype=int)
+    # random numbers are drawn in blocks: 3 per step (explore, action or tie-break, transition)
+    u = rng.random_sample(3 * RANDOM_BLOCK).tolist()
+    j = 0
+
+    start = time.perf_counter()
+    for episode in range(num_episodes):
+        s = int((cum_isd > rng.rand()).argmax())
+        total = 0.0
+        t = 0
+        while t < max_episode_length:
+            if j == len(u):
+                u = rng.random_sample(3 * RANDOM_BLOCK).tolist()
+                j = 0
+            u_explore, u_action, u_outcome = u[j], u[j + 1], u[j + 2]
+            j += 3
+
+            # QLearner.select_action
+            row = q[s]
+            if u_explore < epsilon:
+                a = int(u_action * num_actions)
+            else:
+                best = max(row)
+                if row.count(best) == 1:
+                    a = row.index(best)
+                else:
+                    ties = [i for i, v in enumerate(row) if v == best]
+                    a = ties[int(u_action * len(ties))]
+
+            # alias sampling of the outcome (see simple_grid.alias_sample)
+            scaled = u_outcome * MAX_OUTCOMES
+            k = int(scaled)
+            if scaled - k >= accept[s][a][k]:
+                k = alias[s][a][k]
+            s_next, r, d = next_state[s][a][k], reward[s][a][k], done[s][a][k]
+
+            # QLearner.process_experience, including its bootstrap from the argmax index
+            if not d:
+                next_row = q[s_next]
+                row[a] = row[a] * (1 - lr) + lr * (r + discount * next_row.index(max(next_row)))
+            else:
+                row[a] = row[a] * (1 - lr) + lr * r
+
+            total += r
+            t += 1
+            s = s_next
+            if d:
+                break
+        returns[episode] = total
+        lengths[episode] = t
+    elapsed = time.perf_counter() - start
+
+    agent.ql[...] = q
+    episodes_per_sec = num_episodes / elapsed if elapsed > 0 else float('inf')
+    if verbose:
+        print("%d episodes, %d steps in %.2fs: %.0f episodes/s, %.0f steps/s" % (
+            num_episodes, lengths.sum(), elapsed, episodes_per_sec, lengths.sum() / elapsed if elapsed > 0 else 0))
+    return {'returns': returns, 'lengths': lengths, 'episodes_per_sec': episodes_per_sec}
@@ -2,13 +2,17 @@ import simple_grid
 from q_learning_skeleton import *
 import gym
 
-def act_loop(env, agent, num_episodes):
+def act_loop(env, agent, num_episodes, recorder=None):
+    # with an EpisodeRecorder nothing is rendered while acting; every step is recorded instead
+    # and episodes can be replayed afterwards with recorder.replay(episode)
     for episode in range(num_episodes):
         state = env.reset()
+        if recorder is not None:
+            recorder.start(state, episode)
 
         print('---episode %d---' % episode)
         renderit = False
-        if episode % 10 == 0:
+        if episode % 10 == 0 and recorder is None:
             renderit = True
 
         for t in range(MAX_EPISODE_LENGTH):
@@ -29,17 +33,47 @@ def act_loop(env, agent, num_episodes):
                 print("act:", action)
                 print("reward=%s" % reward)
 
+            if recorder is not None:
+                recorder.record(action, new_state, reward, done)
+
             agent.process_experience(state, action, new_state, reward, done)
             state = new_state
             if done:
                 print("Episode finished after {} timesteps".format(t+1))
-                env.render()
+                if recorder is None:
+                    env.render()
                 agent.report()
                 break
 
     env.close()
 
 
+def batch_act_loop(env, agent, num_episodes):
+    """
+    Runs a BatchQLearner on a BatchDrunkenWalkEnv: agent i acts in copy i of the environment,
+    until every copy has finished num_episodes episodes. Returns the returns of all episodes,
+    shape (n_agents, num_episodes).
+    """
+    returns = np.zeros((env.n, num_episodes))
+    state = env.reset()
+    while True:
+        agents = np.flatnonzero(env.episode < num_episodes)
+        if len(agents) == 0:
+            return returns
+        action = agent.select_actions(state[agents], agents)
+        actions = np.zeros(env.n, dtype=int)
+        actions[agents] = action
+        episode = env.episode.copy()
+        new_state, reward, done, info = env.step(actions)
+        # truncated episodes did not reach a terminal state, so they are still bootstrapped
+        terminal = done & ~info["truncated"]
+        agent.process_experience(state[agents], action, info["terminal_state"][agents], reward[agents],
+                                 terminal[agents], agents)
+        finished = agents[done[agents]]
+        returns[finished, episode[finished]] = info["episode_return"][finished]
+        state = new_state
+
+
 if __name__ == "__main__":
   #  env = simple_grid.DrunkenWalkEnv(map_name="walkInThePark")
     env = simple_grid.DrunkenWalkEnv(map_name="theAlley")
@@ -57,3 +57,54 @@ class QLearner():
         """
         print("---")
     #    print(self.ql)
+
+
+class BatchQLearner():
+    """
+    n_agents independent Q-learning agents (e.g. one per seed or per configuration), stored as
+    one (n_agents, num_states, num_actions) Q tensor and updated together in one vectorized step.
+    Unlike QLearner, the update uses every agent's own learning rate and discount and bootstraps
+    from the largest Q-value of the next state.
+    """
+    def __init__(self, n_agents, num_states, num_actions, discount=DEFAULT_DISCOUNT, learning_rate=LEARNINGRATE,
+                 epsilon=EPSILON, seed=None):
+        """
+        :param discount, learning_rate, epsilon: a single value for all agents, or one per agent
+        :param seed: seed of the random generator used for exploration and tie-breaking
+        """
+        self.name = "batch"
+        self.n_agents = n_agents
+        self.num_actions = num_actions
+        self.discount = np.broadcast_to(np.asarray(discount, dtype=float), (n_agents,))
+        self.learning_rate = np.broadcast_to(np.asarray(learning_rate, dtype=float), (n_agents,))
+        self.epsilon = np.broadcast_to(np.asarray(epsilon, dtype=float), (n_agents,))
+        self.ql = np.zeros((n_agents, num_states, num_actions))
+        self.agents = np.arange(n_agents)
+        self.rng = np.random.RandomState(seed)
+
+    def process_experience(self, states, actions, next_states, rewards, dones, agents=None):
+        """
+        TD update of one transition per agent.
+        :param agents: indices of the agents the transitions belong to, all agents by default
+        """
+        agents = self.agents if agents is None else np.asarray(agents)
+        lr = self.learning_rate[agents]
+        future = self.ql[agents, next_states].max(axis=1)
+        target = rewards + self.discount[agents] * np.where(dones, 0.0, future)
+        self.ql[agents, states, actions] = self.ql[agents, states, actions] * (1 - lr) + lr * target
+
+    def select_actions(self, states, agents=None):
+        """
+        Epsilon-greedy actions of the agents in the given states; ties between the best actions
+        are broken uniformly at random.
+        """
+        agents = self.agents if agents is None else np.asarray(agents)
+        q = self.ql[agents, states]
+        best = q == q.max(axis=1, keepdims=True)
+        # the largest random key among the best actions picks one of them uniformly
+        greedy = np.argmax(best * self.rng.random_sample(q.shape), axis=1)
+        explore = self.rng.random_sample(len(agents)) < self.epsilon[agents]
+        return np.where(explore, self.rng.randint(self.num_actions, size=len(agents)), greedy)
+
+    def report(self):
+        print("---")
@@ -5,19 +5,18 @@
 # adapted by Frans Oliehoek.
 # 
 
+# The grid dynamics only need NumPy; the gym-compatible DrunkenWalkEnv lives in simple_grid_gym.py
+# and is imported (together with gym) only when simple_grid.DrunkenWalkEnv is first accessed.
+
 import sys
-from contextlib import closing
 
 import numpy as np
-from six import StringIO, b
-
-from gym import utils
-from gym.envs.toy_text import discrete
 
 LEFT = 0
 DOWN = 1
 RIGHT = 2
 UP = 3
+ACTION_NAMES = ["Left", "Down", "Right", "Up"]
 
 MAPS = {
     "theAlley": [
@@ -93,7 +92,291 @@ def generate_random_map(size=8, p=0.8):
     return ["".join(x) for x in res]
 
 
-class DrunkenWalkEnv(discrete.DiscreteEnv):
+def reachable_goal(holes):
+    """Checks many maps at once for a path from the start (top left) to the goal (bottom right).
+    :param holes: boolean array (n, size, size), True where there is a pothole
+    :return: boolean array (n,), True for valid maps
+
+    With scipy, the free tiles of all maps are labeled in one connected-component pass (4-connected
+    within each map, never across maps) and a map is valid when start and goal share a label.
+    Without scipy, a flood fill from the start grows the reached region of all maps together.
+    """
+    passable = ~holes
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+    if ndimage is not None:
+        structure = np.zeros((3, 3, 3), dtype=bool)
+        structure[1] = [[0, 1, 0], [1, 1, 1], [0, 1, 0]]
+        labels, _ = ndimage.label(passable, structure)
+        return (labels[:, 0, 0] == labels[:, -1, -1]) & (labels[:, 0, 0] > 0)
+
+    reached = np.zeros_like(holes)
+    reached[:, 0, 0] = passable[:, 0, 0]
+    count = reached.sum()
+    while True:
+        # several growth steps (in place) per check of whether the region still changes; every
+        # shift only adds passable tiles, so the region never spreads on from a pothole
+        for _ in range(max(holes.shape[1:])):
+            reached[:, 1:, :] |= reached[:, :-1, :] & passable[:, 1:, :]
+            reached[:, :-1, :] |= reached[:, 1:, :] & passable[:, :-1, :]
+            reached[:, :, 1:] |= reached[:, :, :-1] & passable[:, :, 1:]
+            reached[:, :, :-1] |= reached[:, :, 1:] & passable[:, :, :-1]
+        new_count = reached.sum()
+        if new_count == count:
+            return reached[:, -1, -1]
+        count = new_count
+
+
+# candidate maps drawn at once are limited to about this many tiles in total
+BATCH_TILES = 2 ** 20
+
+
+def random_hole_masks(n, size=8, p=0.8, seed=None, batch_size=None):
+    """Generates n random valid maps (see generate_random_map) as pothole masks.
+    :param n: number of maps
+    :param size: size of each side of the grid
+    :param p: probability that a tile is frozen
+    :param seed: seed of the random generator, for reproducible map sets
+    :param batch_size: number of candidate maps drawn and checked at once; by default twice the
+                       number still missing, within BATCH_TILES tiles
+    :return: boolean array (n, size, size), True where there is a pothole
+    """
+    rng = np.random.RandomState(seed)
+    p = min(1, p)
+    valid = []
+    found = 0
+    while found < n:
+        candidates = batch_size or min(max(2 * (n - found), 16), max(BATCH_TILES // (size * size), 1))
+        holes = rng.random_sample((candidates, size, size)) >= p
+        holes[:, 0, 0] = False
+        holes[:, -1, -1] = False
+        holes = holes[reachable_goal(holes)]
+        valid.append(holes)
+        found += len(holes)
+    return np.concatenate(valid)[:n]
+
+
+def hole_mask_to_desc(holes):
+    """Converts one pothole mask to a map, a list of strings as returned by generate_random_map."""
+    res = np.where(holes, 'H', '.')
+    res[0][0] = 'S'
+    res[-1][-1] = 'G'
+    return ["".join(x) for x in res]
+
+
+def generate_random_maps(n, size=8, p=0.8, seed=None, path=None):
+    """Generates n random valid maps in bulk, checking connectivity of all candidates at once.
+    :param n: number of maps
+    :param size: size of each side of the grid
+    :param p: probability that a tile is frozen
+    :param seed: seed of the random generator, for reproducible map sets
+    :param path: if given, the maps are also written there in the compact format of save_maps
+    :return: list of maps, each a list of strings like generate_random_map returns
+    """
+    holes = random_hole_masks(n, size, p, seed)
+    if path is not None:
+        save_maps(path, holes)
+    return [hole_mask_to_desc(h) for h in holes]
+
+
+def save_maps(path, holes):
+    """Writes pothole masks (n, size, size) to a compressed .npz file with one bit per tile."""
+    holes = np.asarray(holes, dtype=bool)
+    np.savez_compressed(path, bits=np.packbits(holes.reshape(len(holes), -1), axis=1), shape=holes.shape)
+
+
+def load_maps(path):
+    """Reads maps written by save_maps.
+    :return: list of maps, each a list of strings like generate_random_map returns
+    """
+    with np.load(path) as data:
+        n, nrow, ncol = data['shape']
+        holes = np.unpackbits(data['bits'], axis=1, count=nrow * ncol).astype(bool).reshape(n, nrow, ncol)
+    return [hole_mask_to_desc(h) for h in holes]
+
+
+# row and column offsets of LEFT, DOWN, RIGHT, UP
+ROW_STEP = np.array([0, 1, 0, -1])
+COL_STEP = np.array([-1, 0, 1, 0])
+# every (state, action) has at most this many outcomes
+MAX_OUTCOMES = 4
+GOAL_RESET_REWARD = 42
+
+
+def transition_arrays(desc, states=None):
+    """ Builds the transitions of a map as dense arrays of shape (nS, nA, MAX_OUTCOMES):
+        next state, probability, reward and done of every outcome, vectorized over the whole
+        grid. The outcomes are in the same order as the P lists of GridWorld; unused
+        outcomes have probability 0. If states is given, only those rows are built.
+
+        At the goal the first outcome (reset with prob. 1) is the only one that categorical
+        sampling can ever pick, so the three moves listed after it get probability 0.
+    """
+    desc = np.asarray(desc, dtype='c')
+    nrow, ncol = desc.shape
+    nA = 4
+    letters = desc.ravel()
+    if states is None:
+        states = np.arange(nrow * ncol)
+    states = np.asarray(states)
+    nS = len(states)
+    rows, cols = np.divmod(states, ncol)
+
+    # the three moves of every action: intended, and sideways to either side
+    directions = (np.arange(nA)[:, None] + np.array([0, -1, 1])) % 4
+    move_rows = np.clip(rows[:, None, None] + ROW_STEP[directions], 0, nrow - 1)
+    move_cols = np.clip(cols[:, None, None] + COL_STEP[directions], 0, ncol - 1)
+    move_next = move_rows * ncol + move_cols
+    move_done = letters[move_next] == b'G'
+    move_reward = np.where(move_done, REWARD, SLEEP_DEPRIVATION_PENALTY)
+
+    shape = (nS, nA, MAX_OUTCOMES)
+    next_state = np.broadcast_to(states[:, None, None], shape).copy()
+    prob = np.zeros(shape)
+    reward = np.zeros(shape)
+    done = np.zeros(shape, dtype=bool)
+
+    # normal pavement (and start): intended with prob. 0.8, sideways with prob. 0.1 each
+    next_state[:, :, :3] = move_next
+    prob[:, :, :3] = [0.8, 0.1, 0.1]
+    reward[:, :, :3] = move_reward
+    done[:, :, :3] = move_done
+
+    # pothole: trip with prob. POTHOLE_PROB, otherwise move as intended
+    hole = letters[states] == b'H'
+    next_state[hole] = states[hole, None, None]
+    prob[hole] = [POTHOLE_PROB, 1.0 - POTHOLE_PROB, 0.0, 0.0]
+    reward[hole] = 0.0
+    reward[hole, :, 0] = BROKEN_LEG_PENALTY
+    done[hole] = False
+    done[hole, :, 0] = True
+    next_state[hole, :, 1] = move_next[hole, :, 0]
+    reward[hole, :, 1] = move_reward[hole, :, 0]
+    done[hole, :, 1] = move_done[hole, :, 0]
+
+    # goal: reset with prob. 1, followed by the (never sampled) moves
+    goal = letters[states] == b'G'
+    next_state[goal, :, 0] = states[goal, None]
+    prob[goal] = [1.0, 0.0, 0.0, 0.0]
+    reward[goal, :, 0] = GOAL_RESET_REWARD
+    done[goal, :, 0] = True
+    next_state[goal, :, 1:] = move_next[goal]
+    reward[goal, :, 1:] = move_reward[goal]
+    done[goal, :, 1:] = move_done[goal]
+
+    return next_state, prob, reward, done
+
+
+def sparse_transition_model(desc, chunk_size=65536):
+    """ Builds the transition model of a map without materializing P or the dense arrays:
+
+        transition_matrices: one scipy.sparse CSR matrix (nS, nS) per action, holding the probability
+            of moving from s to s' without the episode ending
+        done_prob: (nS, nA) probability that the episode ends
+        expected_reward: (nS, nA) expected immediate reward
+
+        (outcomes that end the episode are kept out of the matrices, since a trip at a pothole and
+        a move blocked by the border both lead back to s, but only one of them is terminal)
+
+        The map is processed in chunks of chunk_size states, so only the sparse result is ever
+        held for the whole map. Requires scipy.
+    """
+    from scipy import sparse
+
+    desc = np.asarray(desc, dtype='c')
+    nS, nA = desc.size, 4
+    done_prob = np.empty((nS, nA))
+    expected_reward = np.empty((nS, nA))
+    entries = [([], [], []) for _ in range(nA)]
+    for start in range(0, nS, chunk_size):
+        states = np.arange(start, min(start + chunk_size, nS))
+        next_state, prob, reward, done = transition_arrays(desc, states)
+        done_prob[states] = (prob * done).sum(axis=2)
+        expected_reward[states] = (prob * reward).sum(axis=2)
+        stay = prob * ~done
+        for a in range(nA):
+            rows, k = np.nonzero(stay[:, a])
+            entries[a][0].append(states[rows])
+            entries[a][1].append(next_state[rows, a, k])
+            entries[a][2].append(stay[rows, a, k])
+    transition_matrices = [
+        sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(nS, nS))
+        for rows, cols, data in entries]
+    return transition_matrices, done_prob, expected_reward
+
+
+def alias_tables(prob):
+    """ Builds Walker alias tables for every row of a (..., K) probability array, all rows at once.
+
+        Returns (accept, alias) of the same shape: to sample a row, draw a column k uniformly and
+        keep it with probability accept[k], otherwise take alias[k]. Each of the K - 1 rounds
+        below pairs, in every row, the smallest unfinished entry with the largest one.
+    """
+    K = prob.shape[-1]
+    flat = prob.reshape(-1, K)
+    rows = np.arange(len(flat))
+    accept = flat * K / flat.sum(axis=1, keepdims=True)
+    alias = np.broadcast_to(np.arange(K), flat.shape).copy()
+    finished = np.zeros(flat.shape, dtype=bool)
+    for _ in range(K - 1):
+        small = np.where(finished, np.inf, accept).argmin(axis=1)
+        candidates = np.where(finished, -np.inf, accept)
+        candidates[rows, small] = -np.inf
+        large = candidates.argmax(axis=1)
+        # rows whose smallest entry is already >= 1 only have entries of exactly 1 left
+        pair = accept[rows, small] < 1
+        alias[rows[pair], small[pair]] = large[pair]
+        accept[rows[pair], large[pair]] -= 1 - accept[rows[pair], small[pair]]
+        finished[rows, small] = True
+    # the last entry of every row keeps itself; clear rounding errors
+    accept[~finished] = 1.0
+    return accept.reshape(prob.shape), alias.reshape(prob.shape)
+
+
+def alias_sample(accept, alias, u):
+    """ Samples outcome indices from alias tables (..., K), using one uniform number u per sample. """
+    K = accept.shape[-1]
+    scaled = np.asarray(u) * K
+    k = scaled.astype(int)
+    keep = (scaled - k) < np.take_along_axis(accept, k[..., None], axis=-1)[..., 0]
+    return np.where(keep, k, np.take_along_axis(alias, k[..., None], axis=-1)[..., 0])
+
+
+def outcome_counts(desc):
+    """ Number of outcomes listed in P[s][a] for every state: 4 at the goal, 2 at a pothole, 3 elsewhere. """
+    letters = np.asarray(desc, dtype='c').ravel()
+    return np.where(letters == b'G', 4, np.where(letters == b'H', 2, 3))
+
+
+def transitions_to_P(next_state, prob, reward, done, counts):
+    """ Converts dense transition arrays to the P dict of dicts of lists used by DiscreteEnv. """
+    nS, nA, _ = next_state.shape
+    rows = zip(next_state.tolist(), prob.tolist(), reward.tolist(), done.tolist(), counts.tolist())
+    return {s: {a: list(zip(ps[a][:n], ns[a][:n], rs[a][:n], ds[a][:n])) for a in range(nA)}
+            for s, (ns, ps, rs, ds, n) in enumerate(rows)}
+
+
+def highlight(text):
+    """ Surrounds text with the terminal codes of a red background (as gym.utils.colorize). """
+    return '\x1b[41m%s\x1b[0m' % text
+
+
+def render_ansi(desc, s, lastaction=None):
+    """ Returns the ansi text frame of state s on a map (as GridWorld.render(mode='ansi')). """
+    ncol = desc.shape[1]
+    row, col = s // ncol, s % ncol
+    desc = [[c.decode('utf-8') for c in line] for line in desc.tolist()]
+    desc[row][col] = highlight(desc[row][col])
+    if lastaction is not None:
+        header = " (last action was '{action}')\n".format(action=ACTION_NAMES[lastaction])
+    else:
+        header = "\n"
+    return header + "\n".join(''.join(line) for line in desc) + "\n"
+
+
+class GridWorld(object):
     """
     A simple grid environment, completely based on the code of 'FrozenLake', credits to 
     the original authors.
@@ -125,10 +408,13 @@ class DrunkenWalkEnv(discrete.DiscreteEnv):
 
     metadata = {'render.modes': ['human', 'ansi']}
 
-    def __init__(self, desc=None, map_name="4x4",is_slippery=True):
+    def __init__(self, desc=None, map_name="4x4",is_slippery=True, sparse=False):
         """ This generates a map and sets all transition probabilities.
 
-            (by passing constructed nS, nA, P, isd to DiscreteEnv)
+            With sparse=True the transitions are only stored as sparse per-action matrices
+            (see sparse_transition_model), which scales to maps with millions of cells;
+            steps then compute the outcomes of the current (state, action) on the fly.
+            In both modes P is only built when it is first accessed.
         """
         if desc is None and map_name is None:
             desc = generate_random_map()
@@ -139,89 +425,230 @@ class DrunkenWalkEnv(discrete.DiscreteEnv):
         self.nrow, self.ncol = nrow, ncol = desc.shape
         self.reward_range = (0, 1)
 
-        nA = 4
-        nS = nrow * ncol
-
-        isd = np.array(desc == b'S').astype('float64').ravel()
-        isd /= isd.sum()
-
-        # We need to pass 'P' to DiscreteEnv:
-        # P dictionary dict of dicts of lists, where
-        # P[s][a] == [(probability, nextstate, reward, done), ...]
-        P = {s : {a : [] for a in range(nA)} for s in range(nS)}
-
-        def to_s(row, col):
-            return row*ncol + col
-
-        #def inc(row, col, a):
-        def intended_destination(row, col, a):
-            if a == LEFT:
-                col = max(col-1,0)
-            elif a == DOWN:
-                row = min(row+1,nrow-1)
-            elif a == RIGHT:
-                col = min(col+1,ncol-1)
-            elif a == UP:
-                row = max(row-1,0)
-            return (row, col)
-
-        def construct_transition_for_intended(row, col, a, prob, li):
-            """ this constructs a transition to the "intended_destination(row, col, a)"
-                and adds it to the transition list (which could be for a different action b).
-
-            """
-            newrow, newcol = intended_destination(row, col, a)
-            newstate = to_s(newrow, newcol)
-            newletter = desc[newrow, newcol]
-            done = bytes(newletter) in b'G'
-            rew = REWARD if newletter == b'G' else SLEEP_DEPRIVATION_PENALTY
-            li.append( (prob, newstate, rew, done) )
-
-
-        for row in range(nrow):
-            for col in range(ncol):
-                # specify transitions for s=(row, col)
-                s = to_s(row, col)
-                letter = desc[row, col]
-                for a in range(4):
-                    # specify transitions for action a
-                    li = P[s][a]
-                    if letter in b'G':
-                        #when we are at goal, we reset with prob. 1
-                        li.append((1.0, s, 42, True))
-                        #really, this should not be happening, since we get done
-                        #when transitioning TO the goal state (not from it).
-                    if letter in b'H':
-                        #when we are at a pothole, we trip with prob. POTHOLE_PROB
-                        li.append((POTHOLE_PROB, s, BROKEN_LEG_PENALTY, True))
-                        construct_transition_for_intended(row, col, a, 1.0 - POTHOLE_PROB, li)
-                        
-                    else:
-                        # with prob. 0.8 we move as intended:
-                        construct_transition_for_intended(row, col, a, 0.8, li)
-                        # but with prob. 0.1 we move sideways to intended:
-                        for b in [(a-1)%4, (a+1)%4]:
-                            construct_transition_for_intended(row, col, b, 0.1, li)
-
-        super(DrunkenWalkEnv, self).__init__(nS, nA, P, isd)
+        self.nA = 4
+        self.nS = nrow * ncol
+
+        self.isd = np.array(desc == b'S').astype('float64').ravel()
+        self.isd /= self.isd.sum()
+
+        self.sparse = sparse
+        if sparse:
+            self.transition_matrices, self.done_prob, self.expected_reward = sparse_transition_model(desc)
+        else:
+            # dense (nS, nA, K) transition arrays; outcome k of taking action a in state s leads to
+            # next_state[s, a, k] with probability trans_prob[s, a, k], and so on
+            self.next_state, self.trans_prob, self.trans_reward, self.trans_done = transition_arrays(desc)
+            # alias tables, so step() samples the next state in O(1)
+            self.alias_accept, self.alias_index = alias_tables(self.trans_prob)
+
+        # P (dict of dicts of lists, P[s][a] == [(probability, nextstate, reward, done), ...])
+        # is built lazily by the property below
+        self._P = None
+        self.lastaction = None # for rendering
+        self.seed()
+        self.reset()
+
+    def seed(self, seed=None):
+        self.np_random = np.random.RandomState(seed)
+        return [seed]
+
+    def reset(self):
+        # the same draw as gym's categorical_sample
+        self.s = (np.cumsum(self.isd) > self.np_random.rand()).argmax()
+        self.lastaction = None
+        return int(self.s)
+
+    @property
+    def P(self):
+        if self._P is None:
+            arrays = transition_arrays(self.desc) if self.sparse else \
+                (self.next_state, self.trans_prob, self.trans_reward, self.trans_done)
+            self._P = transitions_to_P(*arrays, outcome_counts(self.desc))
+        return self._P
+
+    @P.setter
+    def P(self, P):
+        self._P = P
+
+    def transitions(self, s, a):
+        """ Returns next states, probabilities, rewards and dones of the outcomes of action a in state s. """
+        if self.sparse:
+            next_state, prob, reward, done = transition_arrays(self.desc, [s])
+            return next_state[0, a], prob[0, a], reward[0, a], done[0, a]
+        return self.next_state[s, a], self.trans_prob[s, a], self.trans_reward[s, a], self.trans_done[s, a]
+
+    def step(self, a):
+        s = self.s
+        if self.sparse:
+            # outcomes are computed on the fly; one uniform draw against the cumulative probabilities
+            next_state, probs, reward, done = self.transitions(s, a)
+            i = (np.cumsum(probs) > self.np_random.rand()).argmax()
+        else:
+            # O(1) alias sampling: one uniform draw picks a column and decides between it and its alias
+            next_state, probs, reward, done = self.next_state[s, a], self.trans_prob[s, a], \
+                self.trans_reward[s, a], self.trans_done[s, a]
+            scaled = self.np_random.rand() * MAX_OUTCOMES
+            i = int(scaled)
+            if scaled - i >= self.alias_accept[s, a, i]:
+                i = self.alias_index[s, a, i]
+        self.s = next_state[i]
+        self.lastaction = a
+        return (int(self.s), float(reward[i]), bool(done[i]), {"prob": float(probs[i])})
+
+    def sample_transitions(self, states, actions, rng=None):
+        """ Samples the outcomes of arrays of (state, action) pairs at once, without changing the env.
+            :param rng: np.random.RandomState to draw from, the env's own np_random by default
+            :return: next states, rewards and dones, arrays shaped like states
+        """
+        rng = self.np_random if rng is None else rng
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        u = rng.random_sample(states.shape)
+        if self.sparse:
+            next_state, prob, reward, done = transition_arrays(self.desc, states.ravel())
+            flat = np.arange(states.size)
+            next_state, prob, reward, done = (x[flat, actions.ravel()].reshape(states.shape + (MAX_OUTCOMES,))
+                                              for x in (next_state, prob, reward, done))
+            i = (np.cumsum(prob, axis=-1) > u[..., None]).argmax(axis=-1)
+        else:
+            next_state, reward, done = self.next_state[states, actions], self.trans_reward[states, actions], \
+                self.trans_done[states, actions]
+            i = alias_sample(self.alias_accept[states, actions], self.alias_index[states, actions], u)
+        take = lambda x: np.take_along_axis(x, i[..., None], axis=-1)[..., 0]
+        return take(next_state), take(reward), take(done)
 
     def action_to_string(self, action_index):
-        s ="{}".format(["Left","Down","Right","Up"][action_index])
+        s ="{}".format(ACTION_NAMES[action_index])
         return s
 
     def render(self, mode='human'):
-        outfile = StringIO() if mode == 'ansi' else sys.stdout
-
-        row, col = self.s // self.ncol, self.s % self.ncol
-        desc = self.desc.tolist()
-        desc = [[c.decode('utf-8') for c in line] for line in desc]
-        desc[row][col] = utils.colorize(desc[row][col], "red", highlight=True)
-        if self.lastaction is not None:
-            outfile.write(" (last action was '{action}')\n".format( action=self.action_to_string(self.lastaction) ) )
-        else:
-            outfile.write("\n")
-        outfile.write("\n".join(''.join(line) for line in desc)+"\n")
-
+        frame = render_ansi(self.desc, self.s, self.lastaction)
         if mode != 'human':
-            with closing(outfile):
-                return outfile.getvalue()
+            return frame
+        sys.stdout.write(frame)
+
+    def close(self):
+        # nothing to release; present so GridWorld can stand in for the gym env (e.g. in act_loop)
+        pass
+
+
+class BatchDrunkenWalkEnv(object):
+    """
+    N copies of GridWorld (on the same map or on different maps) that are stepped together:
+    the states of all copies are integer arrays and one call to step() advances every copy with a
+    few vectorized NumPy operations on the stacked transition arrays and alias tables.
+
+    Copies whose episode ends are reset automatically; step() then returns their new start
+    state, and info["terminal_state"] holds the state the episode actually ended in.
+    """
+
+    def __init__(self, n=1, desc=None, map_name="4x4", descs=None, max_episode_steps=None, seed=None):
+        """ :param n: number of copies (ignored when descs is given)
+            :param desc, map_name: map of all copies, as for GridWorld
+            :param descs: one map per copy, for copies on different maps
+            :param max_episode_steps: if given, episodes are also ended (truncated) after this many steps
+            :param seed: seed of the random generator
+        """
+        if descs is None:
+            if desc is None and map_name is None:
+                desc = generate_random_map()
+            elif desc is None:
+                desc = MAPS[map_name]
+            descs = [desc] * n
+
+        # every distinct map is built once; its rows are stacked after those of the previous maps
+        layouts = {}
+        maps = []
+        map_of_copy = []
+        for d in descs:
+            d = np.asarray(d, dtype='c')
+            key = (d.shape, d.tobytes())
+            if key not in layouts:
+                layouts[key] = len(maps)
+                maps.append(d)
+            map_of_copy.append(layouts[key])
+        arrays = [transition_arrays(m) for m in maps]
+        sizes = np.array([m.size for m in maps])
+        map_offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        starts = [np.flatnonzero(m.ravel() == b'S') for m in maps]
+        start_offsets = np.concatenate([[0], np.cumsum([len(s) for s in starts])[:-1]])
+
+        self.descs = maps
+        self.n = len(descs)
+        self.nA = 4
+        self.map_index = np.array(map_of_copy)
+        self.nS = sizes[self.map_index]
+        self.offset = map_offsets[self.map_index]
+        self.next_state, self.trans_prob, self.trans_reward, self.trans_done = \
+            (np.concatenate(parts) for parts in zip(*arrays))
+        self.alias_accept, self.alias_index = alias_tables(self.trans_prob)
+        self.start_states = np.concatenate(starts)
+        self.start_offset = start_offsets[self.map_index]
+        self.start_count = np.array([len(s) for s in starts])[self.map_index]
+        self.max_episode_steps = max_episode_steps
+
+        self.rng = np.random.RandomState(seed)
+        self.s = np.zeros(self.n, dtype=int)
+        self.episode = np.zeros(self.n, dtype=int)
+        self.t = np.zeros(self.n, dtype=int)
+        self.episode_return = np.zeros(self.n)
+        self.reset()
+
+    def seed(self, seed=None):
+        self.rng = np.random.RandomState(seed)
+        return [seed]
+
+    def _start(self, copies):
+        # like DiscreteEnv, start uniformly in one of the 'S' tiles of the map
+        pick = (self.rng.random_sample(len(copies)) * self.start_count[copies]).astype(int)
+        return self.start_states[self.start_offset[copies] + pick]
+
+    def reset(self):
+        """ Resets all copies and their episode counters; returns the start states. """
+        copies = np.arange(self.n)
+        self.s = self._start(copies)
+        self.episode[:] = 0
+        self.t[:] = 0
+        self.episode_return[:] = 0
+        return self.s.copy()
+
+    def step(self, actions):
+        """ Advances every copy by one step.
+            :param actions: integer array (n,) with the action of every copy
+            :return: next states, rewards, dones and an info dict with the arrays
+                     terminal_state (state reached before any auto-reset), truncated,
+                     and episode_return / episode_length (valid where the episode ended)
+        """
+        actions = np.asarray(actions)
+        g = self.offset + self.s
+        # alias sampling (see alias_sample), indexing the tables of all copies at once
+        scaled = self.rng.random_sample(self.n) * MAX_OUTCOMES
+        k = scaled.astype(int)
+        i = np.where(scaled - k < self.alias_accept[g, actions, k], k, self.alias_index[g, actions, k])
+        next_state = self.next_state[g, actions, i]
+        reward = self.trans_reward[g, actions, i]
+        done = self.trans_done[g, actions, i]
+
+        self.t += 1
+        self.episode_return += reward
+        truncated = ~done & (self.t >= self.max_episode_steps) if self.max_episode_steps else np.zeros(self.n, dtype=bool)
+        finished = done | truncated
+        info = {"terminal_state": next_state, "truncated": truncated,
+                "episode_return": self.episode_return.copy(), "episode_length": self.t.copy()}
+
+        self.s = next_state.copy()
+        if finished.any():
+            copies = np.flatnonzero(finished)
+            self.s[copies] = self._start(copies)
+            self.episode[copies] += 1
+            self.t[copies] = 0
+            self.episode_return[copies] = 0
+        return self.s.copy(), reward, done | truncated, info
+
+
+def __getattr__(name):
+    # the gym-compatible environment is loaded lazily, so importing simple_grid does not import gym
+    if name == 'DrunkenWalkEnv':
+        from simple_grid_gym import DrunkenWalkEnv
+        return DrunkenWalkEnv
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
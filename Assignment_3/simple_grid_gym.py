@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+# simple_grid_gym.py
+# The gym-compatible DrunkenWalkEnv: a thin wrapper that gives the NumPy GridWorld of
+# simple_grid.py gym's action/observation spaces and seeding. Import it from here or access
+# simple_grid.DrunkenWalkEnv, which loads this module lazily.
+
+from gym.envs.toy_text import discrete
+
+from simple_grid import GridWorld
+
+
+class DrunkenWalkEnv(GridWorld, discrete.DiscreteEnv):
+    """
+    GridWorld as a gym DiscreteEnv. The dynamics (step, reset, P, render) are those of GridWorld;
+    DiscreteEnv adds action_space, observation_space and gym's seeding.
+    """
+
+    def __init__(self, desc=None, map_name="4x4",is_slippery=True, sparse=False):
+        GridWorld.__init__(self, desc, map_name, is_slippery, sparse)
+        discrete.DiscreteEnv.__init__(self, self.nS, self.nA, None, self.isd)
+
+    def seed(self, seed=None):
+        return discrete.DiscreteEnv.seed(self, seed)